@@ -0,0 +1,72 @@
+import sys
+import time
+import logging
+import resource
+import multiprocessing
+from csm.bindings import csmxsd
+from csm.lxml_decoder import CSMRecordDecoder
+from csm.pyxb_handler import RestPyxbHandler
+
+logger = logging.getLogger(__name__)
+
+
+def _decode(decoder_name, xml_text):
+    if decoder_name == 'pyxb':
+        return csmxsd().CreateFromDocument(xml_text)
+    decoder = CSMRecordDecoder(csmxsd, RestPyxbHandler.FAST_RESPONSE_TYPES)
+    root = decoder.parse(xml_text)
+    if not decoder.decodes(root):
+        return csmxsd().CreateFromDocument(xml_text)
+    return decoder.decode(root)
+
+
+def _measure(decoder_name, filename, results):
+    """
+    Decode a recorded response in a separate process, so that peak RSS of one decoder does not hide the other.
+    """
+    with open(filename, 'rb') as f:
+        xml_text = f.read().decode('utf-8')
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    resp = _decode(decoder_name, xml_text)
+    elapsed = time.time() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, (rss_after - rss_before) / 1024.0, type(resp).__name__))
+
+
+def benchmark(filename):
+    """
+    Compare parse time and peak RSS growth of PyXB and lxml decoders for a recorded CSM response.
+
+    :param filename: File with XML response, e.g. saved with `RestPyxbHandler.write_file`
+    """
+    for decoder_name in ['pyxb', 'lxml']:
+        results = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=_measure, args=(decoder_name, filename, results))
+        proc.start()
+        elapsed, rss_mb, resp_type = results.get()
+        proc.join()
+        logger.info("{}: {:5} {:8.3f} s {:8.1f} MB RSS ({})".format(filename, decoder_name, elapsed, rss_mb, resp_type))
+
+
+def main():
+    """
+    Benchmark decoding of recorded CSM responses given as arguments.
+    """
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO,  # INFO, INFO, WARNING, ERROR, CRITICAL
+        format='[%(asctime)s-%(levelname)s]: %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p')
+
+    if len(sys.argv) < 2:
+        logger.error("Usage: {} response.xml [response.xml ...]".format(sys.argv[0]))
+        return
+    for filename in sys.argv[1:]:
+        benchmark(filename)
+
+    return
+
+# Standard boilerplate to call main() function.
+if __name__ == "__main__":
+    main()
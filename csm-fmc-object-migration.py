@@ -24,6 +24,7 @@ def migrate_network_objects(csm_obj, fmc_obj, action='CREATE'):
                 # csm_obj.write_file(policy_obj, 'bc-oob.xml')
                 csm_obj.print_rules(policy_obj)
 
+            csm_obj.complete_tables('network')  # Members of groups used in the policy
             csm_obj.order_tables(obj_type='network')  # Child first order
 
             if action is 'CREATE':
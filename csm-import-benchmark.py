@@ -0,0 +1,64 @@
+import sys
+import json
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# Each scenario runs in a fresh interpreter, so that modules loaded by one do not hide the cost of the other
+SCENARIOS = [
+    ('import csm', 'import csm'),
+    ('import csm + PyXB bindings', 'import csm; csm.pyxb_handler.csmxsd()'),
+]
+
+CHILD_CODE = """
+import sys, time, json, resource
+start = time.time()
+{statement}
+elapsed = time.time() - start
+print(json.dumps({{
+    'time': elapsed,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    'csmxsd': 'csm.csmxsd' in sys.modules,
+    'netaddr': 'netaddr' in sys.modules,
+    'pyxb': 'pyxb' in sys.modules}}))
+"""
+
+
+def measure(statement, repeat=5):
+    """
+    Run `statement` in `repeat` fresh interpreters.
+
+    :return: Fastest run, with its time, peak RSS and which of the heavy modules were imported
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', CHILD_CODE.format(statement=statement)])
+        runs.append(json.loads(output.splitlines()[-1]))
+    return min(runs, key=lambda run: run['time'])
+
+
+def main():
+    """
+    Benchmark import time and memory of the `csm` package. Run it from the repository root.
+    """
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO,  # INFO, INFO, WARNING, ERROR, CRITICAL
+        format='[%(asctime)s-%(levelname)s]: %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p')
+
+    repeat = 5
+    if len(sys.argv) > 1:
+        repeat = int(sys.argv[1])
+    for name, statement in SCENARIOS:
+        run = measure(statement, repeat)
+        loaded = [module for module in ['csmxsd', 'pyxb', 'netaddr'] if run[module]]
+        logger.info("{:30} {:6.3f} s {:6.1f} MB RSS, loaded: {}".format(
+            name, run['time'], run['rss_mb'], ', '.join(loaded) or '-'))
+
+    return
+
+# Standard boilerplate to call main() function.
+if __name__ == "__main__":
+    main()
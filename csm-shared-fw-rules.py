@@ -16,8 +16,8 @@ def get_all_access_rules(csm_obj):
         if not (po.policyName.startswith('.') or po.policyName.endswith('QUARANTINE')):
             print(po.policyName)
             if 'BC-OOB' in po.policyName:
-                for policy_obj in csm_obj.getPolicyConfigByName(po.policyName, policy_type):
-                    csm_obj.print_rules(policy_obj)
+                rules = csm_obj.rule_table(po.policyName, policy_type)
+                rules.to_csv(po.policyName + '.csv')  # One row per source, destination and service
 
 def main():
     logging.basicConfig(
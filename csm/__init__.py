@@ -1,9 +1,10 @@
 """Python module for interacting with Cisco Security Manager (CSM).
 """
 from .api import CSM
+from .rules import CSMRuleTable
 
 __author__ = "Chetankumar Phulpagare"
 __copyright__ = ""
 __credits__ = ["Chetankumar Phulpagare"]
 __email__ = "chetanph"
-__all__ = ['CSM']
\ No newline at end of file
+__all__ = ['CSM', 'CSMRuleTable']
\ No newline at end of file
@@ -1,9 +1,12 @@
 import base64
 import logging
-from rest import AppClient, RestClient
+import threading
+import itertools
+from time import time
+from rest import AppClient, RestClient, imap_parallel
 from pyxb_handler import RestPyxbHandler
+from rules import CSMRuleTable
 from collections import OrderedDict
-from netaddr import *
 import re
 
 logger = logging.getLogger(__name__)
@@ -13,6 +16,57 @@ class CSMError(Exception):
     pass
 
 
+def _child_first_levels(obj_table):
+    """
+    Order objects of `obj_table` child first with Kahn's algorithm, in O(objects + references) and without recursion.
+
+    :param obj_table: Mapping of GID: policy object
+    :return: Tuple of list of levels, each a list of GIDs, set of GIDs on reference cycles, set of GIDs of groups
+        containing them and set of referenced GIDs that are not in `obj_table`
+    """
+    parents = dict((gid, []) for gid in obj_table)  # Mapping of child GID: list of parent GIDs
+    pending = {}  # Mapping of GID: number of children not ordered yet
+    dangling = set()
+    for gid, obj in obj_table.items():
+        count = 0
+        if obj.refGIDs is not None:
+            for child_gid in set(obj.refGIDs.gid):
+                if child_gid in parents:
+                    parents[child_gid].append(gid)
+                    count += 1
+                else:
+                    dangling.add(child_gid)
+        pending[gid] = count
+
+    levels = []
+    level = [gid for gid in obj_table if pending[gid] == 0]
+    while level:
+        levels.append(level)
+        next_level = []
+        for gid in level:
+            for parent_gid in parents[gid]:
+                pending[parent_gid] -= 1
+                if pending[parent_gid] == 0:
+                    next_level.append(parent_gid)
+        level = next_level
+
+    # Objects left over are on cycles or contain them. Move the ones only containing them, from the top, to blocked.
+    left = set(gid for gid, count in pending.items() if count)
+    blocked = set()
+    has_parents = dict((gid, len([p for p in parents[gid] if p in left])) for gid in left)
+    tops = [gid for gid, count in has_parents.items() if count == 0]
+    while tops:
+        gid = tops.pop()
+        left.discard(gid)
+        blocked.add(gid)
+        for child_gid in set(obj_table[gid].refGIDs.gid):
+            if child_gid in left:
+                has_parents[child_gid] -= 1
+                if has_parents[child_gid] == 0:
+                    tops.append(child_gid)
+    return levels, left, blocked, dangling
+
+
 class CsmClient(AppClient):
     def __init__(self, *args, **kwargs):
         self.AUTH_HTTP_STATUS = 200
@@ -23,12 +77,18 @@ class CsmClient(AppClient):
             ('protVersion', '1.0'),
             ('reqId', '123')
         ])
+        self._req_ids = itertools.count(1)
+        # Session expires when idle, ping before that. Must be shorter than the session timeout configured in CSM.
+        self.HEARTBEAT_IDLE = 10 * 60
+        self.last_request = time()
+        self._heartbeat_thread = None
+        self._heartbeat_stop = threading.Event()
         super(CsmClient, self).__init__(*args, **kwargs)
 
     def login(self, *args, **kwargs):
         base64str = base64.b64encode('{}:{}'.format(self.username, self.password))
         self.hdrs_auth["Authorization"] = "Basic {}".format(base64str)
-        login_dict = self.post_data.copy()
+        login_dict = self.new_post_data()
         login_dict.update(OrderedDict([
                 ('username', self.username),
                 ('password', self.password),
@@ -41,7 +101,16 @@ class CsmClient(AppClient):
 
     def logout(self):
         self.LOGOUT_URL = '/nbi/logout'
-        self.logout_data = self.post_data.copy()
+        self.logout_data = self.new_post_data()
+
+    def new_post_data(self):
+        """
+        Common request elements with a new 'reqId'. Request IDs are unique within the client, so that responses can be
+        matched with their requests when threads share one CSM session.
+        """
+        post_data = self.post_data.copy()
+        post_data['reqId'] = str(next(self._req_ids))
+        return post_data
 
     def prepare_data(self, *args, **kwargs):
         if kwargs.get('req_type') is None:
@@ -55,9 +124,10 @@ class CsmClient(AppClient):
         method = kwargs['method']
         if method != 'POST':
             raise CSMError("HTTP method {} is not supported".format(method))
+        self.last_request = time()
 
         super(CsmClient, self)._req(*args, **kwargs)
-        
+
 
 class CSMRestClient(RestClient, CsmClient, RestPyxbHandler):
     """
@@ -70,7 +140,53 @@ class CSMRestClient(RestClient, CsmClient, RestPyxbHandler):
     RestDataHandler
     object
     """
-    pass
+    def login(self, *args, **kwargs):
+        with self._auth_lock:
+            super(CSMRestClient, self).login(*args, **kwargs)
+            self.last_request = time()
+            self._start_heartbeat()
+
+    def logout(self, *args, **kwargs):
+        self._stop_heartbeat()
+        super(CSMRestClient, self).logout(*args, **kwargs)
+
+    def reauthenticate(self, token):
+        """
+        Login again when CSM rejects session cookie `token`, e.g. session expired while the client was suspended. Only
+        one thread logs in, other threads that were rejected with the same cookie simply repeat their requests.
+        """
+        with self._auth_lock:
+            if token == self.token:
+                logger.info("{}: CSM session expired, logging in again".format(self.url))
+                self.login()
+        return True
+
+    def _start_heartbeat(self):
+        if self._heartbeat_thread is not None and self._heartbeat_thread.is_alive():
+            return
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='CSMHeartbeat')
+        self._heartbeat_thread.daemon = True
+        self._heartbeat_thread.start()
+
+    def _stop_heartbeat(self):
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None and self._heartbeat_thread is not threading.current_thread():
+            self._heartbeat_thread.join()
+        self._heartbeat_thread = None
+
+    def _heartbeat(self):
+        """
+        Keep the session alive with a ping whenever no request was sent for `HEARTBEAT_IDLE` seconds. A busy client,
+        e.g. paging through a policy, never pings.
+        """
+        while not self._heartbeat_stop.wait(max(1, self.last_request + self.HEARTBEAT_IDLE - time())):
+            if time() - self.last_request >= self.HEARTBEAT_IDLE:
+                try:
+                    self.ping()
+                except Exception:
+                    logger.exception("{}: CSM heartbeat failed".format(self.url))
+                    self.last_request = time()  # Do not retry immediately
 
 
 class CSM(CSMRestClient):
@@ -88,12 +204,17 @@ class CSM(CSMRestClient):
         :param password: ISE password
         """
         super(CSM, self).__init__(url=url, username=username, password=password)
+        self._tables_lock = threading.RLock()  # Tables are shared by threads using this CSM session
         self.obj_tables = {}
         self.obj_tables['network'] = {}
         self.obj_tables['service'] = {}
         self.ordered_tables = {}
         self.ordered_tables['network'] = OrderedDict()  # This makes sure child objects appear before parent
         self.ordered_tables['service'] = OrderedDict()  # This makes sure child objects appear before parent
+        self.dangling_gids = {'network': set(), 'service': set()}  # Referenced, but not found in CSM
+        self.cyclic_gids = {'network': set(), 'service': set()}  # On reference cycles, cannot be ordered
+        self.blocked_gids = {'network': set(), 'service': set()}  # Containing objects on cycles, cannot be ordered
+        self.object_levels = {'network': [], 'service': []}  # GIDs of ordered tables by nesting depth
 
     def _valid_gid(self, gid):
         GID_PATTERN = r'[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}'
@@ -103,11 +224,15 @@ class CSM(CSMRestClient):
             return False
 
     def _csm_req(self, url, req_type, req_dict=None):
-        data_dict = self.post_data.copy()
+        data_dict = self.new_post_data()
         if req_dict is not None:
             data_dict.update(req_dict)
         logger.debug(data_dict)
         response = self._req(url, method="POST", data=data_dict, req_type=req_type)
+        resp_id = getattr(response, 'reqId', None)
+        if resp_id is not None and resp_id != data_dict['reqId']:
+            raise CSMError("{}: Response with reqId {} received for {} with reqId {}".format(
+                url, resp_id, req_type, data_dict['reqId']))
         return response
 
     def ping(self):
@@ -273,7 +398,7 @@ class CSM(CSMRestClient):
         req_dict = OrderedDict([(obj_type + 'PolicyObject', [])])
         for obj_name in obj_names:
             req_dict[obj_type + 'PolicyObject'].append(OrderedDict([('name', obj_name)]))
-        self._csm_req(url, 'getPolicyObjectRequest', req_dict)
+        return self._csm_req(url, 'getPolicyObjectRequest', req_dict)
 
     def getObjectsByGid(self, obj_type, obj_gids):
         if obj_type not in ['network', 'service']:
@@ -287,7 +412,23 @@ class CSM(CSMRestClient):
             if not self._valid_gid(obj_gid):
                 raise CSMError("Object GID {} is not valid.", obj_gid)
             req_dict[obj_type + 'PolicyObject'].append(OrderedDict([('gid', obj_gid)]))
-        self._csm_req(url, 'getPolicyObjectRequest', req_dict)
+        return self._csm_req(url, 'getPolicyObjectRequest', req_dict)
+
+    def getPolicyObjectsListByType(self, obj_type, workers=4):
+        """GET POLICY OBJECTS LIST BY TYPE
+
+        The GetPolicyObjectsListByType method returns all policy objects of
+        a type. Generator function yielding response of each page, in order.
+
+        :param obj_type: Object type, 'network' or 'service'
+        """
+        if obj_type not in ['network', 'service']:
+            raise CSMError('Object type {} is invalid!'.format(obj_type))
+
+        url = self.url + '/nbi/configservice/getPolicyObjectsListByType'
+        req_dict = OrderedDict([('policyObjectType', obj_type.capitalize() + 'PolicyObject')])
+        for resp in self._csm_pages(url, 'policyObjectsListByTypeRequest', req_dict, workers=workers):
+            yield resp
 
     def getObjectByName(self, obj_type, obj_name):
         """Deprecated"""
@@ -321,13 +462,16 @@ class CSM(CSMRestClient):
         policy_list = self._csm_req(url, 'policyNamesByTypeRequest', req_dict)
         return policy_list
 
-    def getPolicyConfigByName(self, policy_name, policy_type):
+    def getPolicyConfigByName(self, policy_name, policy_type, workers=4):
         """GET POLICY CONFIG BY NAME
 
         The GetPolicyConfigByName method returns a specific policy object and
         its associated configuration based on the shared policy name passed
         into the method
         Example policy_type: DeviceAccessRuleUnifiedFirewallPolicy
+
+        Generator function yielding response of each page, in order. Pages
+        after the first are fetched by up to `workers` threads.
         """
         if policy_type not in self.POLICY_TYPES:
             raise CSMError("Policy type {} is invalid.", policy_type)
@@ -335,25 +479,54 @@ class CSM(CSMRestClient):
         url = self.url + '/nbi/configservice/getPolicyConfigByName'
         req_dict = OrderedDict([
                 ('name', policy_name),
-                ('policyType', policy_type),
-                ('startIndex', 0)
+                ('policyType', policy_type)
             ])
-        policy_obj = self._csm_req(url, 'policyConfigByNameRequest', req_dict)
-        self.ping()  # Ping in case connection is lost
-        self.update_tables(policy_obj)
-        yield policy_obj
-        if policy_obj.endIndex is not None:
-            while policy_obj.totalCount > policy_obj.endIndex:
-                # print(policy_obj.endIndex, policy_obj.totalCount)
-                req_dict = OrderedDict([
-                    ('name', policy_name),
-                    ('policyType', policy_type),
-                    ('startIndex', policy_obj.endIndex),
-                ])
-                policy_obj = self._csm_req(url, 'policyConfigByNameRequest', req_dict)
-                self.ping()
-                self.update_tables(policy_obj)
-                yield policy_obj
+        for policy_obj in self._csm_pages(url, 'policyConfigByNameRequest', req_dict, workers=workers):
+            self.update_tables(policy_obj)
+            yield policy_obj
+
+    def _csm_pages(self, url, req_type, req_dict, workers=4):
+        """
+        Generator function for all pages of a paged request, in order. First page tells `totalCount` and page size,
+        then remaining pages are requested concurrently with up to `workers` threads. If CSM returns a page shorter
+        than the first one, start indexes of the pages requested concurrently are wrong, so the rest of the pages are
+        requested one after another, as CSM tells their start. If a page does not tell its end or does not advance, it
+        is yielded and `CSMError` is raised, so a result short of `totalCount` is not taken as complete.
+        """
+        def _page(start_index):
+            page_dict = req_dict.copy()
+            page_dict['startIndex'] = start_index
+            return self._csm_req(url, req_type, page_dict)
+
+        resp = _page(0)
+        yield resp
+        if resp.endIndex is None or resp.totalCount is None:
+            return
+        total_count = resp.totalCount
+        page_size = resp.endIndex - (resp.startIndex or 0)
+        if page_size <= 0:
+            return
+        start_indexes = range(resp.endIndex, total_count, page_size)
+        next_starts = iter(start_indexes[1:] + [total_count])
+        pages = imap_parallel(_page, start_indexes, workers=workers)
+        try:
+            for resp in pages:
+                next_start = next(next_starts)
+                yield resp
+                if resp.endIndex is not None and resp.endIndex < next_start:
+                    logger.debug("{}: Short page, requesting rest of {} sequentially".format(url, req_type))
+                    break
+            else:
+                return
+        finally:
+            pages.close()
+        while resp.endIndex is not None and resp.endIndex < total_count:
+            end_index = resp.endIndex
+            resp = _page(end_index)
+            yield resp
+            if resp.endIndex is None or resp.endIndex <= end_index:
+                raise CSMError("{}: {} page starting at {} ends at {}, pages end short of totalCount {}".format(
+                    url, req_type, end_index, resp.endIndex, total_count))
 
     def update_tables(self, policy_obj):
         """
@@ -362,55 +535,175 @@ class CSM(CSMRestClient):
         :param policy_obj:
         :return:
         """
-        net_objs = self.obj_tables['network']
-        srv_objs = self.obj_tables['service']
-        for net_obj in policy_obj.policyObject.networkPolicyObject:
-            # print(net_obj.gid, net_obj.type, net_obj.name, net_obj.comment)
-            if net_objs.get(net_obj.gid) is None:
-                # self.getObjectsByGid('network', [net_obj_gid])
-                net_objs[net_obj.gid] = net_obj
-        for srv_obj in policy_obj.policyObject.servicePolicyObject:
-            # print(srv_obj.gid, srv_obj.type, srv_obj.name, srv_obj.comment)
-            if srv_objs.get(srv_obj.gid) is None:
-                srv_objs[srv_obj.gid] = srv_obj
+        for obj_type in ['network', 'service']:
+            self._add_objects(obj_type, getattr(policy_obj.policyObject, obj_type + 'PolicyObject'))
+
+    def _add_objects(self, obj_type, objs):
+        obj_table = self.obj_tables[obj_type]
+        with self._tables_lock:
+            for obj in objs:
+                if obj_table.get(obj.gid) is None:
+                    obj_table[obj.gid] = obj
+
+    def missing_objects(self, obj_type):
+        """
+        :return: Set of GIDs referenced by group objects in the table, but not in the table
+        """
+        obj_table = self.obj_tables[obj_type]
+        with self._tables_lock:
+            return set(
+                child_gid for obj in obj_table.values() if obj.refGIDs is not None
+                for child_gid in obj.refGIDs.gid if child_gid not in obj_table)
+
+    def complete_tables(self, obj_type, batch_size=500, workers=4):
+        """
+        Add objects referenced by groups in the table but never seen, e.g. members of groups used in a policy, with
+        `getObjectsByGid` requests of up to `batch_size` GIDs. Repeated for members of the added groups until the table
+        is complete, so it takes one round of batches per nesting level.
+
+        :return: Set of GIDs that CSM did not return, i.e. dangling references. They are not requested again.
+        """
+        requested = set(self.dangling_gids[obj_type])
+        missing = self.missing_objects(obj_type)
+        while missing - requested:
+            gids = sorted(missing - requested)
+            requested.update(gids)
+            batches = [gids[i:i + batch_size] for i in range(0, len(gids), batch_size)]
+            logger.info("{}: Requesting {} missing {} objects in {} batches".format(
+                self.url, len(gids), obj_type, len(batches)))
+            for resp in imap_parallel(lambda batch: self.getObjectsByGid(obj_type, batch), batches, workers=workers):
+                if resp is not None and resp.policyObject is not None:
+                    self._add_objects(obj_type, getattr(resp.policyObject, obj_type + 'PolicyObject'))
+            missing = self.missing_objects(obj_type)
+        if missing - self.dangling_gids[obj_type]:
+            self.dangling_gids[obj_type].update(missing)
+            logger.error("{}: {} objects not found in CSM: {}".format(self.url, obj_type, ', '.join(sorted(missing))))
+        return missing
+
+    def load_objects(self, obj_types=('network', 'service'), workers=4, batch_size=500):
+        """
+        Load whole policy object database of CSM into `obj_tables`, independent of policies. Objects are listed with
+        `getPolicyObjectsListByType`, pages after the first one concurrently, then any referenced object that was not
+        listed is requested with `complete_tables`.
+
+        ```python
+        >>> csm_obj.load_objects()
+        >>> csm_obj.order_tables('network')
+        ```
+
+        :return: Mapping of object type: set of dangling GIDs
+        """
+        dangling = {}
+        for obj_type in obj_types:
+            for resp in self.getPolicyObjectsListByType(obj_type, workers=workers):
+                if resp.policyObject is not None:
+                    self._add_objects(obj_type, getattr(resp.policyObject, obj_type + 'PolicyObject'))
+            logger.info("{}: Loaded {} {} objects".format(self.url, len(self.obj_tables[obj_type]), obj_type))
+            dangling[obj_type] = self.complete_tables(obj_type, batch_size=batch_size, workers=workers)
+        return dangling
 
     def order_tables(self, obj_type):
         """
         Build ordered tables using child first order. XML response from CSM does NOT use child first order for network
-        groups.
+        groups. Objects are ordered level by level: level 0 has objects without children in the table, level N has
+        groups whose deepest child is at level N-1, so objects of one level can be created in parallel once the
+        previous levels exist.
+
+        Only objects already in `obj_tables` are ordered, no requests are sent. Children that are not loaded are
+        skipped and returned, call `complete_tables` first to request them. Objects on reference cycles, and groups
+        containing them, cannot be ordered. They are left out of `ordered_tables` and reported in `cyclic_gids` and
+        `blocked_gids` respectively.
+
+        ```python
+        >>> csm_obj.complete_tables('network')
+        >>> levels, dangling = csm_obj.order_tables('network')
+        >>> [len(gids) for gids in levels]
+        [5120, 310, 12]
+        ```
 
         :param obj_type: Object type, 'network' or 'service'
+        :return: Tuple of list of levels, each a list of GIDs, and set of referenced GIDs that are not loaded
         """
         if obj_type not in ['network', 'service']:
-            logging.error('Object type {} not supported'.format(obj_type))
-        for gid, obj in self.obj_tables[obj_type].items():
-            self.add_child_first(obj, obj_type)
+            raise CSMError('Object type {} not supported'.format(obj_type))
+        with self._tables_lock:
+            obj_table = self.obj_tables[obj_type]
+            levels, cyclic, blocked, dangling = _child_first_levels(obj_table)
+            self.ordered_tables[obj_type] = OrderedDict((gid, obj_table[gid]) for level in levels for gid in level)
+            self.object_levels[obj_type] = levels
+            self.cyclic_gids[obj_type] = cyclic
+            self.blocked_gids[obj_type] = blocked
+        if dangling - self.dangling_gids[obj_type]:
+            logger.warning("{}: {} referenced {} objects are not loaded".format(
+                self.url, len(dangling - self.dangling_gids[obj_type]), obj_type))
+        if cyclic:
+            logger.error("{}: {} {} objects are on reference cycles: {}".format(
+                self.url, len(cyclic), obj_type, ', '.join(obj_table[gid].name for gid in sorted(cyclic))))
+        if blocked:
+            logger.error("{}: {} {} groups contain objects on reference cycles: {}".format(
+                self.url, len(blocked), obj_type, ', '.join(obj_table[gid].name for gid in sorted(blocked))))
+        logger.info("{}: Ordered {} of {} {} objects in {} levels".format(
+            self.url, len(self.ordered_tables[obj_type]), len(obj_table), obj_type, len(levels)))
+        return levels, dangling
+
+    def rule_table(self, policy_name, policy_type='DeviceAccessRuleUnifiedFirewallPolicy', workers=4):
+        """
+        Read a policy into a `CSMRuleTable`, e.g. to export its rules to CSV. Object tables are updated as well, so
+        object names are known for the export.
 
-    def add_child_first(self, obj, obj_type):
-        net_objs = self.obj_tables[obj_type]
-        if obj.refGIDs is not None:
-            for child_gid in obj.refGIDs.gid:
-                if self.ordered_tables[obj_type].get(child_gid) is None:
-                    self.add_child_first(net_objs[child_gid])  # recursion for multi-level nesting
+        ```python
+        >>> csm_obj.rule_table('BC-OOB').to_csv('bc-oob.csv')
+        ```
 
-        if self.ordered_tables[obj_type].get(obj.gid) is None:
-            self.ordered_tables[obj_type][obj.gid] = obj
+        :return: `CSMRuleTable` with rules of the policy
+        """
+        rules = CSMRuleTable(self.obj_tables)
+        for policy_obj in self.getPolicyConfigByName(policy_name, policy_type, workers=workers):
+            rules.add_policy(policy_obj)
+        logger.info("{}: Policy {} has {} rules, {} when expanded".format(
+            self.url, policy_name, len(rules), rules.expanded_count()))
+        return rules
+
+    def flow_index(self, policy_type='DeviceAccessRuleUnifiedFirewallPolicy', rules=None, workers=4):
+        """
+        Build `CSMFlowIndex` to find rules matching a flow, by default over rules of all the shared policies of
+        `policy_type`. Objects referenced by groups, but not used in the policies directly, are requested as well.
+
+        ```python
+        >>> index = csm_obj.flow_index()
+        >>> index.first_match(src='10.1.2.3', dst='172.16.0.5', protocol='tcp', dport=443)
+        ```
+
+        :param rules: (optional) `CSMRuleTable` to index instead of the shared policies
+        :return: `CSMFlowIndex`
+        """
+        from flows import CSMFlowIndex  # Only needed for flow lookups, imports netaddr
+        if rules is None:
+            rules = CSMRuleTable(self.obj_tables)
+            for policy in self.getSharedPolicyListByType(policy_type).policy:
+                for policy_obj in self.getPolicyConfigByName(policy.policyName, policy_type, workers=workers):
+                    rules.add_policy(policy_obj)
+        for obj_type in ['network', 'service']:
+            self.complete_tables(obj_type, workers=workers)
+        return CSMFlowIndex(rules)
 
     def print_rules(self, policy_obj):
-        net_objs = self.obj_tables['network']
-        srv_objs = self.obj_tables['service']
-        for rule in policy_obj.policy.deviceAccessRuleUnifiedFirewallPolicy:
-            for src_gid in rule.sources.networkObjectGIDs.gid:
-                for dst_gid in rule.destinations.networkObjectGIDs.gid:
-                    for srv_gid in rule.services.serviceObjectGIDs.gid:
-                        s = u"{} {} {} {} {} {}".format(
-                            rule.orderId,
-                            rule.policyName,
-                            rule.sectionName,
-                            net_objs[src_gid].name,
-                            net_objs[dst_gid].name,
-                            srv_objs[srv_gid].name)
-                        logging.info(s)
+        """
+        Log each combination of source, destination and service of rules in a `getPolicyConfigByName` response.
+        Use `rule_table` for large policies.
+        """
+        rules = CSMRuleTable(self.obj_tables)
+        rules.add_policy(policy_obj)
+        for row in rules.expand():
+            rule = dict(zip(rules.EXPANDED_COLUMNS, row))
+            s = u"{} {} {} {} {} {}".format(
+                rule['orderId'],
+                rule['policyName'],
+                rule['sectionName'],
+                rule['source'],
+                rule['destination'],
+                rule['service'])
+            logging.info(s)
 
     def fmc_nw_objects(self, fmc):
         """
@@ -419,6 +712,7 @@ class CSM(CSMRestClient):
         :param fmc: Firepower Management Center 6.1 API Object
         :return:
         """
+        from netaddr import IPNetwork, IPAddress  # Only needed for migration to FMC
         # Assume that object table is already updated and all are network object-groups
         net_objs = self.ordered_tables['network']
         for gid, net_obj in net_objs.items():  # child first order
@@ -444,6 +738,8 @@ class CSM(CSMRestClient):
 
             if net_obj.refGIDs is not None:
                 for child_gid in net_obj.refGIDs.gid:  # Works for network policy objects having ipData
+                    if child_gid not in net_objs:  # Dangling reference, reported by `order_tables`
+                        continue
                     if nwog_dict.get("objects") is None:
                         nwog_dict["objects"] = []
 
@@ -0,0 +1,42 @@
+import os
+import hashlib
+import threading
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+BINDINGS_MODULE = __name__.rsplit('.', 1)[0] + '.csmxsd' if '.' in __name__ else 'csmxsd'
+BINDINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csmxsd.py')
+SHAPES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csmxsd_shapes.json')
+TEMPLATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'csmxsd_templates.json')
+
+_csmxsd = None
+_lock = threading.Lock()
+
+
+def csmxsd():
+    """
+    PyXB bindings of CSM schema, imported on first use. `csmxsd` is more than 40,000 lines of generated code, which
+    takes most of the import time and memory of the `csm` package, while responses decoded by `CSMRecordDecoder` do
+    not need it.
+
+    ```python
+    >>> login_xml = csmxsd().loginRequest(**login_data).toxml()
+    ```
+    """
+    global _csmxsd
+    if _csmxsd is None:
+        with _lock:
+            if _csmxsd is None:
+                logger.debug("Loading PyXB bindings {}".format(BINDINGS_MODULE))
+                _csmxsd = importlib.import_module(BINDINGS_MODULE)
+    return _csmxsd
+
+
+def signature():
+    """
+    Hash of bindings source, to tell whether data derived from the bindings, e.g. `SHAPES_FILE`, is still valid.
+    """
+    with open(BINDINGS_FILE, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
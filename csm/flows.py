@@ -0,0 +1,439 @@
+import re
+import logging
+from netaddr import IPNetwork, IPRange, AddrFormatError
+from rest.intervals import IntervalIndex, merge_intervals, ip_to_int, protocol_number, IP_ANY, PORT_ANY, IPV6_OFFSET
+from rules import ANY
+
+logger = logging.getLogger(__name__)
+
+GID_PATTERN = re.compile(r'^[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}$')
+# Port operators of CSM service parameters, e.g. 'eq 443', 'range 1024 65535'
+PORT_OPERATORS = {
+    'eq': lambda lo, hi: (lo, lo),
+    'lt': lambda lo, hi: (0, lo - 1),
+    'gt': lambda lo, hi: (lo + 1, 0xffff),
+    'range': lambda lo, hi: (lo, hi)}
+
+
+def port_interval(port):
+    """
+    Convert CSM port, e.g. '443', '1024-65535', 'eq 443', 'gt 1023' or 'range 1 1023', to `(lo, hi)`.
+
+    :return: Tuple or `None` if the port is not understood, e.g. port names, or the range is empty, e.g. 'lt 0'
+    """
+    words = unicode(port).replace('-', ' ').split()
+    operator = PORT_OPERATORS['range']
+    if words and words[0].lower() in PORT_OPERATORS:
+        operator = PORT_OPERATORS[words.pop(0).lower()]
+    if not 1 <= len(words) <= 2 or not all(word.isdigit() for word in words):
+        return None
+    lo, hi = operator(int(words[0]), int(words[-1]))
+    if lo > hi:
+        return None
+    return lo, hi
+
+
+def service_protocols(protocol):
+    """
+    Convert CSM protocol, e.g. 'tcp', 'tcp&udp' or '6', to list of protocol numbers.
+
+    :return: List, empty for 'ip', i.e. any protocol, or `None` if the protocol is not known
+    """
+    protocol = unicode(protocol or 'ip').strip().lower()
+    if protocol == 'ip':
+        return []
+    try:
+        return [protocol_number(name) for name in re.split(r'[&/,\s-]+', protocol) if name]
+    except KeyError:
+        return None
+
+
+class CSMObjectResolver(object):
+    """
+    Resolve CSM network and service policy objects, including nested groups through 'refGIDs', to merged integer
+    intervals of `rest.intervals`. Network objects are resolved from 'ipData' and 'ipv4Data', service objects
+    from 'serviceParameters' to separate destination and source port intervals.
+
+    Results are cached per GID. After objects of `obj_tables` change, `invalidate` drops them and the groups
+    containing them from the cache.
+
+    Objects that cannot be resolved, e.g. missing from the tables, on reference cycles, FQDN objects or port list
+    references, are recorded in `unresolved`.
+
+    # Parameters
+    obj_tables: Mapping of 'network' and 'service': mapping of GID: policy object, e.g. `CSM.obj_tables`
+    """
+    def __init__(self, obj_tables):
+        self.obj_tables = obj_tables
+        self.unresolved = set()
+        self._cache = {'network': {}, 'service': {}}
+
+    def invalidate(self, obj_type, gids=None):
+        """
+        Forget resolved intervals of changed objects and of all the groups containing them.
+
+        # Parameters
+        obj_type: Object type, 'network' or 'service'
+        gids: (optional) GIDs of the changed objects, by default all objects
+
+        :return: Set of GIDs that were forgotten, `None` if all of them
+        """
+        self.unresolved.clear()
+        if gids is None:
+            self._cache[obj_type].clear()
+            return None
+        parents = {}
+        for gid, obj in self.obj_tables[obj_type].items():
+            if obj.refGIDs is not None:
+                for child_gid in obj.refGIDs.gid:
+                    parents.setdefault(child_gid, []).append(gid)
+        affected = set()
+        stack = list(gids)
+        while stack:
+            gid = stack.pop()
+            if gid not in affected:
+                affected.add(gid)
+                stack.extend(parents.get(gid, []))
+        for gid in affected:
+            self._cache[obj_type].pop(gid, None)
+        return affected
+
+    def resolve(self, obj_type, gid):
+        """
+        :return: Merged intervals of network object, tuple of destination and source port intervals of service
+            object, or `None` if it cannot be resolved
+        """
+        cache = self._cache[obj_type]
+        if gid in cache:
+            return cache[gid]
+        obj_table = self.obj_tables[obj_type]
+        resolving = set()
+        stack = [(gid, False)]
+        while stack:
+            current, children_done = stack.pop()
+            if current in cache:
+                continue
+            obj = obj_table.get(current)
+            if obj is None or (current in resolving and not children_done):
+                self.unresolved.add(current)
+                cache[current] = None
+                continue
+            children = list(obj.refGIDs.gid) if obj.refGIDs is not None else []
+            if not children_done:
+                resolving.add(current)
+                stack.append((current, True))
+                stack.extend((child_gid, False) for child_gid in children if child_gid not in cache)
+                continue
+            resolving.discard(current)
+            cache[current] = self._combine(
+                obj_type, [self._own(obj_type, obj)] + [cache[child_gid] for child_gid in children])
+            if cache[current] is None:
+                self.unresolved.add(current)
+        return cache[gid]
+
+    @staticmethod
+    def _combine(obj_type, parts):
+        if any(part is None for part in parts):
+            return None
+        if obj_type == 'network':
+            return merge_intervals(interval for part in parts for interval in part)
+        return (merge_intervals(interval for part in parts for interval in part[0]),
+                merge_intervals(interval for part in parts for interval in part[1]))
+
+    def _own(self, obj_type, obj):
+        """
+        Intervals of the object itself, without its children.
+        """
+        if obj_type == 'network':
+            if obj.fqdnData is not None:
+                return None
+            intervals = []
+            for value in list(obj.ipData or []) + list(obj.ipv4Data or []):
+                value_intervals = self.network_literal(value)
+                if value_intervals is None:
+                    return None
+                intervals.extend(value_intervals)
+            return intervals
+        dports, sports = [], []
+        for params in obj.serviceParameters or []:
+            ports = self.service_parameters(params)
+            if ports is None:
+                return None
+            dports.extend(ports[0])
+            sports.extend(ports[1])
+        return dports, sports
+
+    @staticmethod
+    def network_literal(value):
+        """
+        Convert 'ipData' value, e.g. '10.1.0.0/16', '10.1.0.0/255.255.0.0', '10.1.2.3' or '10.1.2.3-10.1.2.9', to
+        intervals.
+        """
+        try:
+            if '-' in value:
+                ip_range = IPRange(*value.split('-'))
+                first, last, version = ip_range.first, ip_range.last, ip_range.version
+            else:
+                ip_nw = IPNetwork(value.strip())
+                first, last, version = ip_nw.first, ip_nw.last, ip_nw.version
+        except (AddrFormatError, AttributeError, TypeError, ValueError):
+            return None
+        if version == 6:
+            return [(IPV6_OFFSET + first, IPV6_OFFSET + last)]
+        return [(first, last)]
+
+    @staticmethod
+    def _port_intervals(protocols, port):
+        if not protocols:
+            return [PORT_ANY]
+        if port is None:
+            interval = (0, 0xffff)
+        else:
+            interval = port_interval(port)
+            if interval is None:
+                return None
+        return [((protocol << 16) + interval[0], (protocol << 16) + interval[1]) for protocol in protocols]
+
+    def service_parameters(self, params):
+        """
+        Convert 'serviceParameters' to tuple of destination and source port intervals.
+        """
+        protocols = service_protocols(params.protocol)
+        if protocols is None:
+            return None
+        ports = []
+        for i, port_ref in enumerate([params.destinationPort, params.sourcePort]):
+            if port_ref is not None and port_ref.portRefGID is not None:
+                return None
+            port = port_ref.port if port_ref is not None else None
+            if port is None and i == 0 and params.icmpMessage:  # ICMP type in place of destination port
+                port = params.icmpMessage
+            intervals = self._port_intervals(protocols, port)
+            if intervals is None:
+                return None
+            ports.append(intervals)
+        return tuple(ports)
+
+    def service_literal(self, value):
+        """
+        Convert service literal of `CSMRuleTable`, e.g. 'tcp/443', to tuple of destination and source port intervals.
+        """
+        protocol, _, port = value.partition('/')
+        protocols = service_protocols(protocol)
+        if protocols is None:
+            return None
+        dports = self._port_intervals(protocols, port or None)
+        if dports is None:
+            return None
+        return dports, self._port_intervals(protocols, None)
+
+
+class CSMFlowIndex(object):
+    """
+    Match index for rules of a `CSMRuleTable`, e.g. of all the shared firewall policies. It answers which rules match
+    a flow locally, with one `bisect` per dimension and block of `BLOCK_SIZE` rules, using `IntervalIndex` of
+    `rest.intervals`.
+
+    Each rule is flattened to merged intervals of source and destination addresses and ports, resolved through
+    `CSMObjectResolver`. Ports of all service parameters of a rule are merged per dimension, so a rule with 'tcp/80'
+    and 'udp/53' matches 'udp/80' as well. Rules referring to objects that cannot be resolved match any value of that
+    dimension and are marked as conditional, i.e. reported by `match`, but never as a definite first match. Disabled
+    rules never match.
+
+    The index is kept up to date incrementally: `update` indexes rules added to the table since, and `invalidate`
+    re-flattens only the rules using changed objects and rebuilds only their blocks.
+
+    ```python
+    >>> index = csm_obj.flow_index()
+    >>> for rule_index in index.match(src='10.1.2.3', dst='172.16.0.5', protocol='tcp', dport=443, permit=True):
+            print(index.rules.rule(rule_index))
+    >>> csm_obj.getObjectsByGid('network', changed_gids)  # e.g. after objects changed in CSM
+    >>> index.invalidate('network', changed_gids)
+    ```
+
+    # Parameters
+    rules: `CSMRuleTable`
+    resolver: (optional) `CSMObjectResolver`, by default for `obj_tables` of the rule table
+    """
+    BLOCK_SIZE = 4096
+    DIMENSIONS = ['src', 'dst', 'dport', 'sport']
+
+    def __init__(self, rules, resolver=None):
+        self.rules = rules
+        self.resolver = resolver or CSMObjectResolver(rules.obj_tables)
+        self.flat = []  # Flattened rules: dimension name -> merged intervals, `None` for disabled rules
+        self._blocks = []  # dimension name -> IntervalIndex, one per block
+        self._conditional = []  # Bitmask of conditional rules, one per block
+        self._users = {'network': {}, 'service': {}}  # Mapping of object type: GID: set of rule indexes
+        self.update()
+
+    def __len__(self):
+        return len(self.flat)
+
+    def _token_intervals(self, obj_type, token):
+        if token in self.rules.obj_tables[obj_type] or GID_PATTERN.match(token):
+            return self.resolver.resolve(obj_type, token)
+        if obj_type == 'network':
+            return self.resolver.network_literal(token)
+        return self.resolver.service_literal(token)
+
+    def _flatten(self, rule_index):
+        rules = self.rules
+        enabled = rules.columns['isEnabled'][rule_index]
+        if enabled >= 0 and rules.strings[enabled] == 'false':
+            return None, False
+        conditional = False
+        flat = {}
+        for dim, column in [('src', 'sources'), ('dst', 'destinations')]:
+            intervals = []
+            for token in rules._list(column, rule_index, names=False):
+                token_intervals = [IP_ANY] if token == ANY else self._token_intervals('network', token)
+                if token_intervals is None:
+                    token_intervals = [IP_ANY]
+                    conditional = True
+                intervals.extend(token_intervals)
+                self._users['network'].setdefault(token, set()).add(rule_index)
+            flat[dim] = merge_intervals(intervals)
+        dports, sports = [], []
+        for token in rules._list('services', rule_index, names=False):
+            ports = ([PORT_ANY], [PORT_ANY]) if token == ANY else self._token_intervals('service', token)
+            if ports is None:
+                ports = ([PORT_ANY], [PORT_ANY])
+                conditional = True
+            dports.extend(ports[0])
+            sports.extend(ports[1])
+            self._users['service'].setdefault(token, set()).add(rule_index)
+        flat['dport'] = merge_intervals(dports)
+        flat['sport'] = merge_intervals(sports)
+        return flat, conditional
+
+    def _build_block(self, block_num, conditional=None):
+        start = block_num * self.BLOCK_SIZE
+        block = dict((dim, IntervalIndex()) for dim in self.DIMENSIONS)
+        mask = 0
+        for bit, flat in enumerate(self.flat[start:start + self.BLOCK_SIZE]):
+            if flat is None:
+                continue
+            for dim, dim_index in block.items():
+                dim_index.add(bit, flat[dim])
+            if conditional is not None and conditional[start + bit]:
+                mask |= 1 << bit
+        for dim_index in block.values():
+            dim_index.build()
+        if block_num < len(self._blocks):
+            self._blocks[block_num] = block
+            if conditional is not None:
+                self._conditional[block_num] = mask
+        else:
+            self._blocks.append(block)
+            self._conditional.append(mask)
+
+    def _conditional_flags(self, block_nums):
+        flags = {}
+        for block_num in block_nums:
+            for bit in xrange(self.BLOCK_SIZE):
+                flags[block_num * self.BLOCK_SIZE + bit] = bool(self._conditional[block_num] >> bit & 1)
+        return flags
+
+    def update(self):
+        """
+        Index rules added to the rule table since the index was built or updated.
+
+        :return: Number of rules added
+        """
+        start = len(self.flat)
+        if start == len(self.rules):
+            return 0
+        first_block = start // self.BLOCK_SIZE
+        conditional = self._conditional_flags(range(first_block, len(self._blocks)))
+        for rule_index in xrange(start, len(self.rules)):
+            flat, conditional[rule_index] = self._flatten(rule_index)
+            self.flat.append(flat)
+        for block_num in xrange(first_block, (len(self.flat) - 1) // self.BLOCK_SIZE + 1):
+            self._build_block(block_num, conditional)
+        logger.info("Indexed {} CSM rules in {} blocks".format(len(self.flat), len(self._blocks)))
+        return len(self.flat) - start
+
+    def invalidate(self, obj_type, gids=None):
+        """
+        Re-index rules using objects changed in `obj_tables`, including rules using groups that contain them.
+
+        # Parameters
+        obj_type: Object type, 'network' or 'service'
+        gids: (optional) GIDs of the changed objects, by default all objects
+
+        :return: Number of rules re-indexed
+        """
+        affected = self.resolver.invalidate(obj_type, gids)
+        if affected is None:
+            affected = self._users[obj_type].keys()
+        rule_indexes = set()
+        for gid in affected:
+            rule_indexes.update(self._users[obj_type].get(gid, ()))
+        block_nums = sorted(set(rule_index // self.BLOCK_SIZE for rule_index in rule_indexes))
+        conditional = self._conditional_flags(block_nums)
+        for rule_index in rule_indexes:
+            self.flat[rule_index], conditional[rule_index] = self._flatten(rule_index)
+        for block_num in block_nums:
+            self._build_block(block_num, conditional)
+        logger.info("Re-indexed {} CSM rules in {} blocks".format(len(rule_indexes), len(block_nums)))
+        return len(rule_indexes)
+
+    def is_conditional(self, rule_index):
+        block, bit = divmod(rule_index, self.BLOCK_SIZE)
+        return bool(self._conditional[block] >> bit & 1)
+
+    def match(self, src=None, dst=None, protocol=None, dport=None, sport=None, permit=None):
+        """
+        Generator of indexes into the rule table of all the rules matching a flow, in rule order. Omitted flow
+        attributes match any rule. Ports are only considered if `protocol` is provided, omitted port then matches any
+        port of that protocol.
+
+        # Parameters
+        src: Source IP address
+        dst: Destination IP address
+        protocol: Protocol name or number, e.g. 'tcp' or 6
+        dport: Destination port or ICMP type
+        sport: Source port
+        permit: (optional) Only permit rules if `True`, only deny rules if `False`
+        """
+        query = []
+        if src is not None:
+            query.append(('src', ip_to_int(src), None))
+        if dst is not None:
+            query.append(('dst', ip_to_int(dst), None))
+        if protocol is not None:
+            base = protocol_number(protocol) << 16
+            for dim, port in [('dport', dport), ('sport', sport)]:
+                if port is None:
+                    query.append((dim, base, base + 0xffff))
+                else:
+                    query.append((dim, base + int(port), None))
+        permit_id = None
+        if permit is not None:
+            permit_id = self.rules._string_ids.get('true' if permit else 'false', -2)
+        permit_column = self.rules.columns['permit']
+        for block_num, block in enumerate(self._blocks):
+            base_index = block_num * self.BLOCK_SIZE
+            mask = (1 << min(self.BLOCK_SIZE, len(self.flat) - base_index)) - 1
+            for dim, lo, hi in query:
+                if hi is None:
+                    mask &= block[dim].lookup(lo)
+                else:
+                    mask &= block[dim].lookup_range(lo, hi)
+                if not mask:
+                    break
+            while mask:
+                low_bit = mask & -mask
+                rule_index = base_index + low_bit.bit_length() - 1
+                mask ^= low_bit
+                if permit_id is None or permit_column[rule_index] == permit_id:
+                    yield rule_index
+
+    def first_match(self, *args, **kwargs):
+        """
+        Return index of the first rule that definitely matches a flow, or `None`. Parameters are same as `match`.
+        """
+        for rule_index in self.match(*args, **kwargs):
+            if not self.is_conditional(rule_index):
+                return rule_index
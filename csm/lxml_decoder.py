@@ -0,0 +1,312 @@
+import os
+import json
+import threading
+from decimal import Decimal
+from collections import OrderedDict
+from lxml import etree
+import logging
+from bindings import signature as bindings_signature
+
+logger = logging.getLogger(__name__)
+
+XSI_TYPE = '{http://www.w3.org/2001/XMLSchema-instance}type'
+
+
+class CSMRecord(object):
+    """
+    Lightweight replacement of PyXB binding objects for decoded CSM responses. Child elements are plain attributes with
+    the same names as in PyXB, e.g. `policy_obj.policyObject.networkPolicyObject` or `net_obj.refGIDs.gid`. As with
+    PyXB, an element that is not present in the response is `None`, or an empty list for repeated elements.
+    """
+    _plural = frozenset()
+    _fields = frozenset()
+    _order = []  # Element names in order of first appearance, used to serialize the record back to XML
+
+    def __getattr__(self, name):
+        # Only called for elements that are not present in the response
+        if name in self._plural:
+            value = []
+            self.__dict__[name] = value
+            return value
+        if name in self._fields:
+            return None
+        raise AttributeError("{} has no element {}".format(type(self).__name__, name))
+
+    def __repr__(self):
+        return "<{} {}>".format(type(self).__name__, ' '.join(
+            '{}={!r}'.format(name, self.__dict__[name]) for name in self._order if name in self.__dict__))
+
+    def _to_element(self, tag, nsmap=None):
+        elem = etree.Element(tag, nsmap=nsmap)
+        for name in OrderedDict.fromkeys(self._order):  # Threads decoding same type may add a name twice
+            value = self.__dict__.get(name)
+            for item in (value if isinstance(value, list) else [value]):
+                if isinstance(item, CSMRecord):
+                    elem.append(item._to_element(name))
+                elif item is not None:
+                    etree.SubElement(elem, name).text = _xml_text(item)
+        return elem
+
+    def toxml(self, tag=None):
+        """
+        Serialize the record to XML, for debug output and files written by `RestPyxbHandler`.
+
+        # Parameters
+        tag: Element name, by default the response type of a decoded response
+        """
+        tag = tag or getattr(self, '_tag', None) or type(self).__name__
+        nsmap = None
+        if tag.startswith('{'):
+            nsmap = {'ns1': tag[1:].split('}')[0]}
+        return etree.tostring(self._to_element(tag, nsmap))
+
+
+def _xml_text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):  # XSD list type
+        return ' '.join(_xml_text(item) for item in value)
+    return unicode(value)
+
+
+def _collapse(text):
+    return u' '.join(text.split())
+
+
+def _list_of(converter):
+    return lambda text: [converter(item) for item in text.split()]
+
+
+_CONVERTERS = {
+    'boolean': lambda text: text.strip() in ('true', '1'),
+    'integer': lambda text: int(text) if text.strip() else None,
+    'float': lambda text: float(text) if text.strip() else None,
+    'decimal': lambda text: Decimal(text.strip()) if text.strip() else None,
+    'token': _collapse,
+    'string': unicode,
+}
+
+
+def _value_kind(simple_type):
+    """
+    Kind of text conversion giving the same value type as PyXB uses for `simple_type`, a key of `_CONVERTERS` or
+    'list:' followed by the kind of list items. Date and time values are left as text.
+    """
+    import pyxb.binding.datatypes as xsd
+    if getattr(simple_type, '_ItemType', None) is not None:  # XSD list type
+        return 'list:' + _value_kind(simple_type._ItemType)
+    if issubclass(simple_type, xsd.boolean):
+        return 'boolean'
+    if issubclass(simple_type, (xsd.integer, xsd.int)):
+        return 'integer'
+    if issubclass(simple_type, (xsd.double, xsd.float)):
+        return 'float'
+    if issubclass(simple_type, xsd.decimal):
+        return 'decimal'
+    if issubclass(simple_type, xsd.normalizedString):
+        return 'token'
+    return 'string'
+
+
+def _converter(kind):
+    if kind.startswith('list:'):
+        return _list_of(_converter(kind[5:]))
+    return _CONVERTERS[kind]
+
+
+class _Shape(object):
+    """
+    Decoding information of one complex type: its record class and, per child element name, whether it repeats and
+    how its content is decoded, i.e. child `_Shape` or text converter.
+    """
+    def __init__(self, record_class):
+        self.record_class = record_class
+        self.children = {}
+
+
+class CSMRecordDecoder(object):
+    """
+    Decode CSM XML responses with lxml into `CSMRecord` objects, much faster and with much less memory than PyXB's
+    `CreateFromDocument`. Which elements repeat and the value types of simple elements are taken from the PyXB
+    bindings in `csmxsd`, so records look like the PyXB objects for code using them. Elements missing from the
+    bindings are decoded as text, or as a record if they have children, and become lists when they repeat.
+
+    This schema information of all types reachable from `types` is saved in `cache_file`, so that later runs decode
+    responses without importing the bindings at all. The cache is rebuilt when `signature` of the bindings changes.
+
+    ```python
+    >>> decoder = CSMRecordDecoder(bindings.csmxsd, types, cache_file=bindings.SHAPES_FILE)
+    >>> root = decoder.parse(xml_text)
+    >>> if decoder.decodes(root):
+            policy_obj = decoder.decode(root)
+    ```
+
+    # Parameters
+    bindings: Function returning PyXB bindings module, i.e. `csmxsd`
+    types: Response types, i.e. root element names, decoded by `decode`
+    cache_file: (optional) JSON file for schema information
+    signature: (optional) Function returning version of the bindings, by default `bindings.signature`
+    """
+    def __init__(self, bindings, types, cache_file=None, signature=None):
+        self.bindings = bindings
+        self.types = set(types)
+        self.cache_file = cache_file
+        self.signature = signature or bindings_signature
+        self.roots = {}  # Mapping of response type: complex type name
+        self.schema = {}  # Mapping of complex type name: {element name: [plural, 'type:' + type name or value kind]}
+        self._shapes = {}  # Mapping of complex type name: _Shape
+        self._built = {}  # Same as _shapes, plus shapes still being built
+        self._lock = threading.RLock()
+        self._parser = etree.XMLParser(remove_comments=True, remove_pis=True, huge_tree=True)
+
+    def parse(self, xml_text):
+        if isinstance(xml_text, unicode):
+            # lxml does not accept unicode strings with encoding declaration
+            xml_text = xml_text.encode('utf-8')
+        return etree.fromstring(xml_text, self._parser)
+
+    def decodes(self, root):
+        return etree.QName(root).localname in self.types
+
+    def _compile(self, complex_type):
+        """
+        Add schema information of a PyXB complex type and all complex types it contains.
+        """
+        import pyxb.binding.basis
+        stack = [complex_type]
+        while stack:
+            complex_type = stack.pop()
+            if complex_type.__name__ in self.schema:
+                continue
+            children = {}
+            for name, element_use in complex_type._ElementMap.items():
+                child_type = element_use.elementBinding().typeDefinition()
+                if issubclass(child_type, pyxb.binding.basis.complexTypeDefinition):
+                    children[name.localName()] = [element_use.isPlural(), 'type:' + child_type.__name__]
+                    stack.append(child_type)
+                else:
+                    children[name.localName()] = [element_use.isPlural(), _value_kind(child_type)]
+            self.schema[complex_type.__name__] = children
+
+    def _load_cache(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            if cache.get('signature') != self.signature() or not self.types.issubset(cache['roots']):
+                return False
+        except (IOError, ValueError, KeyError) as err:
+            logger.warning("Ignoring schema cache {}: {}".format(self.cache_file, err))
+            return False
+        self.roots = cache['roots']
+        self.schema = cache['schema']
+        return True
+
+    def _save_cache(self):
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({'signature': self.signature(), 'roots': self.roots, 'schema': self.schema}, f)
+        except (IOError, OSError) as err:
+            logger.warning("Unable to write schema cache {}: {}".format(self.cache_file, err))
+
+    def load_schema(self):
+        """
+        Load schema information of response `types`, from `cache_file` if it is valid, otherwise from the bindings.
+        """
+        with self._lock:
+            if self.roots:
+                return
+            if self._load_cache():
+                return
+            bindings = self.bindings()
+            roots = {}
+            for root in self.types:
+                complex_type = getattr(bindings, root).typeDefinition()
+                self._compile(complex_type)
+                roots[root] = complex_type.__name__
+            self.roots = roots
+            self._save_cache()
+
+    def _type_schema(self, type_name):
+        children = self.schema.get(type_name)
+        if children is None:  # Derived type, e.g. given by xsi:type, which is not reachable from response types
+            with self._lock:
+                self._compile(getattr(self.bindings(), type_name))
+            children = self.schema[type_name]
+        return children
+
+    def _shape(self, type_name):
+        shape = self._shapes.get(type_name)
+        if shape is None:
+            with self._lock:  # Other threads must not see shapes before their children are added
+                shape = self._built.get(type_name) or self._new_shape(type_name)
+                self._shapes.update(self._built)
+        return shape
+
+    def _new_shape(self, type_name):
+        record_class = type(str(type_name), (CSMRecord,), {'_order': []})
+        shape = _Shape(record_class)
+        self._built[type_name] = shape  # Before children, types may be recursive
+        for name, (plural, content) in self._type_schema(type_name).items():
+            if content.startswith('type:'):
+                child_type = content[5:]
+                shape.children[name] = (plural, self._built.get(child_type) or self._new_shape(child_type))
+            else:
+                shape.children[name] = (plural, _converter(content))
+        record_class._plural = frozenset(name for name, (plural, _) in shape.children.items() if plural)
+        record_class._fields = frozenset(shape.children)
+        return shape
+
+    def _xsi_shape(self, elem, shape):
+        xsi_type = elem.get(XSI_TYPE)
+        if xsi_type is None:
+            return shape
+        type_name = xsi_type.split(':')[-1]
+        if type_name not in self.schema and getattr(self.bindings(), type_name, None) is None:
+            logger.warning("Unknown type {} of element {}".format(xsi_type, elem.tag))
+            return shape
+        return self._shape(type_name)
+
+    def _decode(self, elem, shape):
+        record = shape.record_class()
+        values = record.__dict__
+        order = shape.record_class._order
+        children = shape.children
+        for child in elem:
+            name = child.tag
+            if name[0] == '{':
+                name = name.split('}', 1)[1]
+            plural, content = children.get(name, (None, None))
+            if content is None:  # Not in the bindings
+                value = self._decode(child, _GENERIC) if len(child) else (child.text or u'')
+            elif isinstance(content, _Shape):
+                value = self._decode(child, self._xsi_shape(child, content))
+            else:
+                value = content(child.text or u'')
+            if name not in values:
+                if name not in order:
+                    order.append(name)
+                values[name] = [value] if plural else value
+            elif plural or isinstance(values[name], list):
+                values[name].append(value)
+            else:  # Element repeats, but it is not known as plural
+                values[name] = [values[name], value]
+        return record
+
+    def decode(self, root):
+        """
+        Decode response element tree.
+
+        :return: `CSMRecord` of response type
+        """
+        self.load_schema()
+        shape = self._shape(self.roots[etree.QName(root).localname])
+        record = self._decode(root, self._xsi_shape(root, shape))
+        record._tag = root.tag
+        return record
+
+
+_GENERIC = _Shape(type('CSMElement', (CSMRecord,), {'_order': []}))
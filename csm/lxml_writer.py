@@ -0,0 +1,124 @@
+import os
+import json
+import threading
+from lxml import etree
+import logging
+from bindings import signature as bindings_signature
+from lxml_decoder import _xml_text
+
+logger = logging.getLogger(__name__)
+
+XML_DECLARATION = u'<?xml version="1.0" ?>'
+
+
+class CSMRequestWriter(object):
+    """
+    Write CSM requests from `OrderedDict` data directly with lxml, without building PyXB objects.
+
+    CSM expects elements in schema order, which PyXB knows and `OrderedDict` data does not. The first request of each
+    type is therefore built and validated with PyXB, by the caller, and passed to `learn`. Its element names and
+    their order become the template for the request type. Later requests whose elements, at each level, all appeared
+    together in a validated request are written directly, which costs microseconds even in tight paging loops.
+    Otherwise `write` returns `None`, and the request is validated by PyXB again and extends the template.
+
+    Templates are saved in `cache_file`, so that later runs do not import PyXB bindings for known request types.
+
+    ```python
+    >>> req_xml = writer.write('pingRequest', data)
+    >>> if req_xml is None:
+            req_xml = csmxsd().pingRequest(**data).toxml()
+            writer.learn('pingRequest', req_xml)
+    ```
+
+    # Parameters
+    cache_file: (optional) JSON file for templates
+    signature: (optional) Function returning version of the bindings, by default `bindings.signature`
+    """
+    def __init__(self, cache_file=None, signature=None):
+        self.cache_file = cache_file
+        self.signature = signature or bindings_signature
+        # Mapping of request type: {'tag': root tag, 'order': {path: list of element name lists in schema order}}
+        self.templates = None
+        self._lock = threading.Lock()
+
+    def _load_cache(self):
+        templates = {}
+        if self.cache_file is not None and os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file) as f:
+                    cache = json.load(f)
+                if cache.get('signature') == self.signature():
+                    templates = cache['templates']
+            except (IOError, ValueError, KeyError) as err:
+                logger.warning("Ignoring request template cache {}: {}".format(self.cache_file, err))
+        self.templates = templates
+
+    def _save_cache(self):
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump({'signature': self.signature(), 'templates': self.templates}, f)
+        except (IOError, OSError) as err:
+            logger.warning("Unable to write request template cache {}: {}".format(self.cache_file, err))
+
+    def _add_elems(self, elem, path, input_dict, order):
+        keys = [key for key, value in input_dict.items() if value is not None]
+        # Any element order seen in a validated request, which has all the keys, is in schema order
+        names = next((names for names in order.get(path, []) if set(keys).issubset(names)), None)
+        if names is None:
+            return False
+        positions = dict((name, index) for index, name in enumerate(names))
+        for key in sorted(keys, key=positions.get):
+            value = input_dict[key]
+            for item in (value if isinstance(value, list) else [value]):
+                child = etree.SubElement(elem, key)
+                if isinstance(item, dict):
+                    if not self._add_elems(child, path + '/' + key, item, order):
+                        return False
+                else:
+                    child.text = _xml_text(item)
+        return True
+
+    def write(self, req_type, data):
+        """
+        Write request XML from `OrderedDict` data, same as `RestPyxbHandler._dict2pyxb(req_type, data).toxml()`.
+
+        :return: XML string, or `None` when the request does not fit the template of `req_type` yet
+        """
+        if self.templates is None:
+            with self._lock:
+                if self.templates is None:
+                    self._load_cache()
+        template = self.templates.get(req_type)
+        if template is None:
+            return None
+        tag = template['tag']
+        root = etree.Element(tag, nsmap={'ns1': etree.QName(tag).namespace})
+        if not self._add_elems(root, '', data, template['order']):
+            return None
+        return XML_DECLARATION + etree.tostring(root, encoding=unicode)
+
+    def learn(self, req_type, req_xml):
+        """
+        Add element order of a request validated by PyXB to the template of `req_type`.
+        """
+        root = etree.fromstring(req_xml.encode('utf-8') if isinstance(req_xml, unicode) else req_xml)
+        with self._lock:
+            if self.templates is None:
+                self._load_cache()
+            template = self.templates.setdefault(req_type, {'tag': root.tag, 'order': {}})
+            order = template['order']
+            stack = [('', root)]
+            while stack:
+                path, elem = stack.pop()
+                names = []
+                for child in elem:
+                    if child.tag not in names:
+                        names.append(child.tag)
+                    stack.append((path + '/' + child.tag, child))
+                seen = order.setdefault(path, [])
+                if not any(set(names).issubset(seen_names) for seen_names in seen):
+                    seen[:] = [seen_names for seen_names in seen if not set(seen_names).issubset(names)] + [names]
+            self._save_cache()
+
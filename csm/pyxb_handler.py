@@ -1,34 +1,62 @@
-import pyxb
-import csmxsd
 from lxml import etree
 import logging
 from rest import RestDataHandler, RestClientError
 from collections import OrderedDict
+from bindings import csmxsd, SHAPES_FILE, TEMPLATES_FILE
+from lxml_decoder import CSMRecordDecoder
+from lxml_writer import CSMRequestWriter
 
 logger = logging.getLogger(__name__)
 
 
 class RestPyxbHandler(RestDataHandler):
+    """
+    Handle XML data exchange with CSM using PyXB bindings in `csmxsd`. Large responses listed in `FAST_RESPONSE_TYPES`,
+    e.g. policy configurations, are decoded with lxml into `CSMRecord` objects instead, which have the same attributes
+    as PyXB objects. Set `fast_decode` to `False` to decode all responses with PyXB. Requests are written by
+    `CSMRequestWriter` once their type has been validated with PyXB. PyXB bindings are imported only when a request or
+    response actually needs them.
+    """
+    FAST_RESPONSE_TYPES = ['policyConfigResponse',
+                           'policyConfigDeviceResponse',
+                           'policyObjectsListResponse',
+                           'policyObjectConfigResponse',
+                           'deviceListResponse']
+
     def __init__(self, *args, **kwargs):
+        self.fast_decode = True
+        self.decoder = CSMRecordDecoder(csmxsd, self.FAST_RESPONSE_TYPES, cache_file=SHAPES_FILE)
+        self.writer = CSMRequestWriter(cache_file=TEMPLATES_FILE)
         super(RestPyxbHandler, self).__init__(*args, **kwargs)
 
     def login(self, *args, **kwargs):
         self.hdrs_auth["Content-Type"] = "application/xml"
-        self.login_data = csmxsd.loginRequest(**self.login_data).toxml()
+        self.login_data = self.request_xml('loginRequest', self.login_data)
 
     def logout(self, *args, **kwargs):
         self.hdrs_auth["Content-Type"] = "application/xml"
 
     def toprettyxml(self, pyxb_obj):
+        """
+        Pretty printed XML of PyXB object or `CSMRecord`
+        """
         etree_data = etree.fromstring(pyxb_obj.toxml())
         return etree.tostring(etree_data, pretty_print=True)
 
     def handle_response(self, resp):
-        pyxb_resp = csmxsd.CreateFromDocument(resp)
-        logger.debug(u"XML Response\n{}".format(self.toprettyxml(pyxb_resp)))
+        if self.fast_decode:
+            root = self.decoder.parse(resp)
+            if self.decoder.decodes(root):
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(u"XML Response\n{}".format(etree.tostring(root, pretty_print=True, encoding=unicode)))
+                return self.decoder.decode(root)
+        pyxb_resp = csmxsd().CreateFromDocument(resp)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(u"XML Response\n{}".format(self.toprettyxml(pyxb_resp)))
         return pyxb_resp
 
     def _add_elems(self, csmxsd_obj, input_dict):
+        import pyxb
         # logger.debug("{} {}".format(csmxsd_obj, input_dict))
         for key, value in input_dict.items():
             if value is not None:
@@ -53,12 +81,23 @@ class RestPyxbHandler(RestDataHandler):
     def _dict2pyxb(self, req_type, input_dict, **kwargs):
         if not isinstance(input_dict, OrderedDict):
             raise RestClientError("Expecting OrderedDict type for input_dict!")
-        csmxsd_class = csmxsd.__dict__[req_type]
+        csmxsd_class = getattr(csmxsd(), req_type)
         csmxsd_obj = csmxsd_class()
         # xml_data = etree.Element(root_tag, nsmap=nsmap)
         self._add_elems(csmxsd_obj, input_dict)
         return csmxsd_obj
 
+    def request_xml(self, req_type, data):
+        """
+        XML of a request, written from the template of `req_type` if possible. Otherwise the request is built and
+        validated with PyXB and teaches the template its elements.
+        """
+        req_data = self.writer.write(req_type, data)
+        if req_data is None:
+            req_data = self._dict2pyxb(req_type, data).toxml()
+            self.writer.learn(req_type, req_data)
+        return req_data
+
     def prepare_data(self, *args, **kwargs):
         data = kwargs.get('data')
         req_data = None
@@ -66,8 +105,7 @@ class RestPyxbHandler(RestDataHandler):
             req_data = ''
         elif data is not None:
             req_type = kwargs.get('req_type')[5:]
-            req_obj = self._dict2pyxb(req_type, data)
-            req_data = req_obj.toxml()
+            req_data = self.request_xml(req_type, data)
             # logger.debug("data: {}".format(req_data))
         return req_data
 
@@ -0,0 +1,279 @@
+import csv
+import json
+import logging
+from array import array
+from itertools import product
+
+logger = logging.getLogger(__name__)
+
+ANY = 'any'  # Empty sources, destinations or services
+
+
+class CSMRuleTable(object):
+    """
+    Columnar table of CSM firewall rules, e.g. of `DeviceAccessRuleUnifiedFirewallPolicy` policies, for analysis and
+    export of large rulebases.
+
+    Strings, i.e. GIDs, policy and section names, etc., are interned, so each column is an `array` of integer string
+    IDs. Sources, destinations and services hold several values per rule: their values of all rules are kept in one
+    array, and an array of offsets tells where the values of each rule start. Literals, such as 'ipData' of sources,
+    are stored as text in place of a GID.
+
+    A rule matches the cartesian product of its sources, destinations and services. `expand` generates the product
+    lazily, one rule at a time, and `expanded_count` tells its size without generating it. GIDs are translated to
+    object names using `obj_tables` of `CSM` at export time, so objects loaded after the rules are named as well.
+
+    ```python
+    >>> rules = CSMRuleTable(csm_obj.obj_tables)
+    >>> for policy_obj in csm_obj.getPolicyConfigByName(policy_name, 'DeviceAccessRuleUnifiedFirewallPolicy'):
+            rules.add_policy(policy_obj)
+    >>> rules.expanded_count()
+    1254120
+    >>> rules.to_csv('rules.csv')
+    ```
+
+    # Parameters
+    obj_tables: (optional) Mapping of 'network' and 'service': mapping of GID: policy object, e.g. `CSM.obj_tables`
+    """
+    COLUMNS = ['orderId', 'gid', 'name', 'policyName', 'sectionName', 'permit', 'isEnabled', 'direction']
+    LIST_COLUMNS = ['sources', 'destinations', 'services']
+    OBJECT_TYPES = {'sources': 'network', 'destinations': 'network', 'services': 'service'}
+    # Column names of expanded rows, one value of each list column
+    EXPANDED_COLUMNS = COLUMNS + ['source', 'destination', 'service']
+
+    def __init__(self, obj_tables=None):
+        self.obj_tables = obj_tables if obj_tables is not None else {'network': {}, 'service': {}}
+        self.strings = []  # Interned strings, index is the string ID
+        self._string_ids = {}
+        self.columns = dict((column, array('l')) for column in self.COLUMNS)
+        self.offsets = dict((column, array('l', [0])) for column in self.LIST_COLUMNS)
+        self.values = dict((column, array('l')) for column in self.LIST_COLUMNS)
+        self.intern(ANY)
+
+    def __len__(self):
+        return len(self.columns['orderId'])
+
+    def intern(self, value):
+        """
+        :return: ID of string `value`, `-1` for `None`
+        """
+        if value is None:
+            return -1
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        elif not isinstance(value, basestring):
+            value = unicode(value)
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def add_policy(self, policy_obj):
+        """
+        Add all the rules of a `getPolicyConfigByName` response page.
+
+        :return: Number of rules added
+        """
+        count = 0
+        if policy_obj.policy is not None:
+            for rule in policy_obj.policy.deviceAccessRuleUnifiedFirewallPolicy:
+                self.add_rule(rule)
+                count += 1
+        return count
+
+    def add_rule(self, rule):
+        for column in self.COLUMNS:
+            value = getattr(rule, column, None)
+            if column == 'orderId':
+                self.columns[column].append(-1 if value is None else int(value))
+            else:
+                self.columns[column].append(self.intern(value))
+        for column, tokens in [('sources', self._network_tokens(rule.sources)),
+                               ('destinations', self._network_tokens(rule.destinations)),
+                               ('services', self._service_tokens(rule.services))]:
+            self.values[column].extend(self.intern(token) for token in tokens)
+            self.offsets[column].append(len(self.values[column]))
+
+    @staticmethod
+    def _gids(refs):
+        return list(refs.gid) if refs is not None else []
+
+    def _network_tokens(self, refs):
+        if refs is None:
+            return []
+        return self._gids(refs.networkObjectGIDs) + list(refs.ipData or []) + list(refs.ipv4Data or [])
+
+    def _service_tokens(self, refs):
+        if refs is None:
+            return []
+        return self._gids(refs.serviceObjectGIDs) + [
+            self._service_literal(params) for params in refs.serviceParameters or []]
+
+    @staticmethod
+    def _service_literal(params):
+        """
+        Text of service parameters, e.g. 'tcp/443' or 'udp/1024-65535', i.e. protocol and destination port.
+        """
+        literal = unicode(params.protocol or 'ip')
+        port = params.destinationPort
+        if port is not None and port.port is not None:
+            literal += u'/{}'.format(port.port)
+        return literal
+
+    def _row(self, index):
+        row = []
+        for column in self.COLUMNS:
+            value = self.columns[column][index]
+            if column != 'orderId':
+                value = self.strings[value] if value >= 0 else None
+            row.append(value)
+        return row
+
+    def _list_ids(self, column, index):
+        offsets = self.offsets[column]
+        return self.values[column][offsets[index]:offsets[index + 1]]
+
+    def _list(self, column, index, names):
+        ids = self._list_ids(column, index)
+        if not ids:
+            return [ANY]
+        if not names:
+            return [self.strings[string_id] for string_id in ids]
+        obj_table = self.obj_tables.get(self.OBJECT_TYPES[column], {})
+        values = []
+        for string_id in ids:
+            obj = obj_table.get(self.strings[string_id])
+            values.append(obj.name if obj is not None else self.strings[string_id])
+        return values
+
+    def expanded_count(self):
+        """
+        :return: Number of rows `expand` generates, without generating them
+        """
+        total = 0
+        offsets = [self.offsets[column] for column in self.LIST_COLUMNS]
+        for index in xrange(len(self)):
+            count = 1
+            for column_offsets in offsets:
+                count *= max(column_offsets[index + 1] - column_offsets[index], 1)
+            total += count
+        return total
+
+    def rule(self, index, names=True):
+        """
+        Rule as dictionary, with lists of sources, destinations and services.
+
+        # Parameters
+        index: Index of the rule in the table
+        names: Object names in place of GIDs
+        """
+        rule = dict(zip(self.COLUMNS, self._row(index)))
+        for column in self.LIST_COLUMNS:
+            rule[column] = self._list(column, index, names)
+        return rule
+
+    def iter_rules(self, names=True):
+        """
+        Generator function for rules as dictionaries, as per `rule`.
+        """
+        for index in xrange(len(self)):
+            yield self.rule(index, names)
+
+    def expand(self, names=True):
+        """
+        Generator function for rules expanded to each combination of source, destination and service. Rows are lists
+        of values of `EXPANDED_COLUMNS`.
+
+        # Parameters
+        names: Object names in place of GIDs
+        """
+        for index in xrange(len(self)):
+            row = self._row(index)
+            lists = [self._list(column, index, names) for column in self.LIST_COLUMNS]
+            for combination in product(*lists):
+                yield row + list(combination)
+
+    def to_csv(self, csvfile, expand=True, names=True):
+        """
+        Write rules to CSV file, one row per combination of source, destination and service, or with `expand=False`
+        one row per rule and list values separated by spaces.
+
+        # Parameters
+        csvfile: Path of CSV file or file object
+        expand: Expand rules as per `expand`
+        names: Object names in place of GIDs
+
+        :return: Number of rows written
+        """
+        if isinstance(csvfile, basestring):
+            with open(csvfile, 'wb') as f:
+                return self.to_csv(f, expand=expand, names=names)
+        writer = csv.writer(csvfile)
+        count = 0
+        if expand:
+            writer.writerow(self.EXPANDED_COLUMNS)
+            rows = self.expand(names=names)
+        else:
+            writer.writerow(self.COLUMNS + self.LIST_COLUMNS)
+            rows = (self._row(index) + [u' '.join(self._list(column, index, names)) for column in self.LIST_COLUMNS]
+                    for index in xrange(len(self)))
+        for row in rows:
+            writer.writerow([value.encode('utf-8') if isinstance(value, unicode) else value for value in row])
+            count += 1
+        logger.info("Wrote {} rows of {} rules to CSV".format(count, len(self)))
+        return count
+
+    def to_ndjson(self, ndjson_file, expand=False, names=True):
+        """
+        Write rules to NDJSON file, one JSON document per rule, or with `expand=True` per combination of source,
+        destination and service.
+
+        # Parameters
+        ndjson_file: Path of NDJSON file or file object
+        expand: Expand rules as per `expand`
+        names: Object names in place of GIDs
+
+        :return: Number of documents written
+        """
+        if isinstance(ndjson_file, basestring):
+            with open(ndjson_file, 'w') as f:
+                return self.to_ndjson(f, expand=expand, names=names)
+        if expand:
+            records = (dict(zip(self.EXPANDED_COLUMNS, row)) for row in self.expand(names=names))
+        else:
+            records = self.iter_rules(names=names)
+        count = 0
+        for record in records:
+            ndjson_file.write(json.dumps(record, sort_keys=True) + '\n')
+            count += 1
+        logger.info("Wrote {} documents of {} rules to NDJSON".format(count, len(self)))
+        return count
+
+    def to_parquet(self, filename, names=True):
+        """
+        Write rules to Parquet file, one row per rule with list columns for sources, destinations and services. String
+        columns are dictionary encoded. It requires `pyarrow`.
+
+        # Parameters
+        filename: Path of Parquet file
+        names: Object names in place of GIDs
+
+        :return: Number of rows written
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("pyarrow is required for Parquet export, use to_csv or to_ndjson instead")
+        data = {'orderId': pyarrow.array(self.columns['orderId'].tolist(), type=pyarrow.int64())}
+        for column in self.COLUMNS[1:]:
+            data[column] = pyarrow.array(
+                [self.strings[value] if value >= 0 else None for value in self.columns[column]]).dictionary_encode()
+        for column in self.LIST_COLUMNS:
+            data[column] = pyarrow.array([self._list(column, index, names) for index in xrange(len(self))])
+        columns = self.COLUMNS + self.LIST_COLUMNS
+        table = pyarrow.Table.from_arrays([data[column] for column in columns], names=columns)
+        pyarrow.parquet.write_table(table, filename)
+        logger.info("Wrote {} rules to Parquet".format(len(self)))
+        return len(self)
@@ -9,13 +9,38 @@ Please check the examples in the repository for guidance on how to use this modu
 """
 
 from .api import FMC
+from .api import FMCDomain
 from .api import FPObject
 from .api import FPObjectTable
 from .api import FPPolicyTable
 from .api import FPDeviceTable
+from .api import FPAccessPolicy
+from .api import FPAccessRulesTable
+from .rulematch import FPObjectResolver
+from .rulematch import FPRuleIndex
+from .deployment import FPTask
+from .deployment import FPTaskPoller
+from .audit import FPAuditCollector
+from .audit import NDJSONSink
+from .audit import SQLiteSink
+from .audit import table_invalidator
+from .inventory import FPDeviceInventory
+from .api import FPDeviceGroupTable
+from .sync import FPObjectSync
+from .planner import FPRequestPlanner
+from .planner import FPProgress
+from .importer import FPNetworkGroupImporter
+from .importer import FPURLFeedImporter
+from .usage import FPObjectUsage
+from .replicate import FPObjectReplicator
 
 __author__ = "Chetankumar Phulpagare"
 __copyright__ = ""
 __credits__ = ["Chetankumar Phulpagare"]
 __email__ = "chetanph"
-__all__ = ['FMC', 'FPObject', 'FPObjectTable', 'FPDeviceTable', 'FPPolicyTable']
\ No newline at end of file
+__all__ = ['FMC', 'FMCDomain', 'FPObject', 'FPObjectTable', 'FPDeviceTable', 'FPPolicyTable', 'FPAccessPolicy',
+           'FPAccessRulesTable', 'FPObjectResolver', 'FPRuleIndex', 'FPTask', 'FPTaskPoller',
+           'FPAuditCollector', 'NDJSONSink', 'SQLiteSink', 'table_invalidator', 'FPDeviceInventory',
+           'FPDeviceGroupTable', 'FPObjectSync', 'FPRequestPlanner', 'FPProgress',
+           'FPNetworkGroupImporter', 'FPURLFeedImporter', 'FPObjectUsage',
+           'FPObjectReplicator']
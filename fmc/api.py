@@ -1,9 +1,12 @@
 import base64
-from datetime import datetime
-from time import sleep
+import json
+from urllib import quote
+from time import sleep, time
+import threading
 import logging
-from rest import AppClient, RestJSONHandler, RestClient
-from collections import OrderedDict
+from rest import AppClient, RestJSONHandler, RestClient, iter_parallel, map_parallel
+from deployment import FPTaskPoller
+from collections import OrderedDict, deque
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +15,45 @@ class FMCError(Exception):
     pass
 
 
+class RateLimiter(object):
+    """
+    Thread-safe sliding window rate limiter. FMC REST API does not allow more than 120 requests per minute, otherwise
+    it responds with HTTP error 429. Every request reserves a time slot with `acquire` and sleeps until that slot is
+    due, so any number of threads can share one `FMC` object without exceeding the budget.
+
+    # Parameters
+    max_requests: Number of requests allowed within `period`
+    period: Length of the sliding window in seconds
+    """
+    def __init__(self, max_requests=120, period=60):
+        self.max_requests = max_requests
+        self.period = period
+        self.req_count = 0  # Total number of requests
+        self._slots = deque()  # Start time of requests within the sliding window
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Reserve a slot for one request and sleep until it is due.
+
+        :return: Time spent sleeping in seconds
+        """
+        with self._lock:
+            now = time()
+            while self._slots and self._slots[0] <= now - self.period:
+                self._slots.popleft()
+            wait = 0
+            if len(self._slots) >= self.max_requests:
+                # One second of slack, FMC counts requests on its own clock
+                wait = max(0, self._slots.popleft() + self.period + 1 - now)
+            self._slots.append(now + wait)
+            self.req_count += 1
+        if wait > 0:
+            logger.info('FMC ratelimit < {} req/min, sleeping for {:.1f} seconds'.format(self.max_requests, wait))
+            sleep(wait)
+        return wait
+
+
 class FMCClient(AppClient):
     """
     AppClient extension for FMC.
@@ -22,9 +64,18 @@ class FMCClient(AppClient):
         self.AUTH_HDR_FIELD = 'X-auth-access-token'
         self.API_VERSION = 'v1'
         self.AUTH_URL = '/api/fmc_platform/' + self.API_VERSION + '/auth/generatetoken'
+        self.REFRESH_URL = '/api/fmc_platform/' + self.API_VERSION + '/auth/refreshtoken'
+        self.REFRESH_HDR_FIELD = 'X-auth-refresh-token'
+        # Access token expires after 30 min and may be refreshed up to 3 times, then login is required
+        self.TOKEN_REFRESH_INTERVAL = 25 * 60
+        self.MAX_TOKEN_REFRESH = 3
+        self.refresh_token = None
+        self.refresh_count = 0
+        self._refresh_timer = None
         # FMC REST API does not allow more than 120 requests per min
-        self.req_time = datetime.now()
-        self.req_count = 0
+        self.rate_limiter = RateLimiter()
+        self.domains = OrderedDict()  # Mapping of 'domain_name': 'domain_uuid', populated at login
+        self.global_domain_uuid = None
         super(FMCClient, self).__init__(*args, **kwargs)
 
     def login(self, *args, **kwargs):
@@ -42,19 +93,7 @@ class FMCClient(AppClient):
 
     def _req(self, *args, **kwargs):
         # ERR CODE 429: FMC REST API does not allow more than 120 requests per min
-        self.req_count += 1
-        if self.req_count == 1:
-            self.req_time = datetime.now()
-        elif self.req_count < 120:
-            pass
-        else:
-            time_diff = (datetime.now() - self.req_time).total_seconds()
-            if time_diff <= 60:
-                sleep_time = 60 - time_diff + 1
-                logger.info('FMC ratelimit < 120 req/min, sleeping for {} seconds'.format(sleep_time))
-                sleep(sleep_time)
-            self.req_count = 1
-            self.req_time = datetime.now()
+        self.rate_limiter.acquire()
         method = kwargs['method']
         if method not in ['GET', 'POST', 'PUT', 'DELETE']:
             raise FMCError("HTTP method {} is not supported".format(method))
@@ -77,7 +116,67 @@ class FMCRestClient(RestClient, FMCClient, RestJSONHandler):
     object
     ```
     """
-    pass
+    def login(self, *args, **kwargs):
+        with self._auth_lock:
+            super(FMCRestClient, self).login(*args, **kwargs)
+            self.refresh_token = self.login_headers.get(self.REFRESH_HDR_FIELD)
+            self.refresh_count = 0
+            # Domains accessible to the user, e.g. '[{"name": "Global", "uuid": "e276abec-..."}, ...]'
+            self.domains = OrderedDict(
+                (domain['name'], domain['uuid']) for domain in json.loads(self.login_headers.get('DOMAINS') or '[]'))
+            self.global_domain_uuid = self.login_headers.get('DOMAIN_UUID')
+            self._schedule_refresh()
+
+    def logout(self, *args, **kwargs):
+        with self._auth_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+        super(FMCRestClient, self).logout(*args, **kwargs)
+
+    def reauthenticate(self, token):
+        """
+        Replace expired access `token`. Token is refreshed with 'auth/refreshtoken' as long as FMC allows it, after
+        that login is repeated. Only one thread renews the token, other threads that were rejected with the same token
+        simply repeat their requests with the new one.
+        """
+        with self._auth_lock:
+            if token != self.token:  # Renewed by another thread meanwhile
+                return True
+            if self.refresh_token is None or self.refresh_count >= self.MAX_TOKEN_REFRESH or not self._refresh():
+                logger.info("{}: Access token expired, logging in again".format(self.url))
+                self.login()
+        return True
+
+    def _refresh(self):
+        self.rate_limiter.acquire()
+        hdrs = {self.AUTH_HDR_FIELD: self.token, self.REFRESH_HDR_FIELD: self.refresh_token}
+        resp = self.session.post(self.url + self.REFRESH_URL, headers=hdrs, verify=False)
+        if resp.status_code != self.AUTH_HTTP_STATUS:
+            logger.warning("{}: Access token refresh failed with HTTP error {}".format(self.url, resp.status_code))
+            return False
+        self.token = resp.headers.get(self.AUTH_REQ_HDR_FIELD)
+        self.refresh_token = resp.headers.get(self.REFRESH_HDR_FIELD, self.refresh_token)
+        self.refresh_count += 1
+        logger.info("{}: Access token refreshed {} of {} times".format(
+            self.url, self.refresh_count, self.MAX_TOKEN_REFRESH))
+        self._schedule_refresh()
+        return True
+
+    def _schedule_refresh(self):
+        # Renew the token before it expires, so that long running jobs are not interrupted
+        with self._auth_lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+            self._refresh_timer = threading.Timer(self.TOKEN_REFRESH_INTERVAL, self._refresh_due)
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+
+    def _refresh_due(self):
+        try:
+            self.reauthenticate(self.token)
+        except Exception:
+            logger.exception("{}: Scheduled access token refresh failed".format(self.url))
 
 
 class FMC(FMCRestClient):
@@ -90,6 +189,8 @@ class FMC(FMCRestClient):
     username: Login username for FMC server. Ensure that appropriate user role and permissions are assigned
     to perform all the intended tasks.
     password: Login password for FMC server.
+    domain: (optional) Name or UUID of the FMC domain, e.g. 'Global/LeafA'. By default, 'default' domain, i.e. Global,
+    is used. Other domains can be accessed through the same login with `domain` method.
 
     """
     __v1_domain__ = '/api/fmc_config/v1/domain/default/'
@@ -105,7 +206,7 @@ class FMC(FMCRestClient):
     # fmc_platform/v1/domain/default/audit/
     API_PATH['audit'] = '/api/fmc_platform/v1/domain/default/audit/'
     POLICY_TYPES = [
-        "accesspolicies", "filepolicies", "intrusionpolicies",
+        "accesspolicies", "filepolicies", "intrusionpolicies", "ftdnatpolicies",
         "snmpalerts", "syslogalerts"]
     URL_OBJECT_TYPES = ['urls', 'urlgroups']
     NETWORK_OBJECT_TYPES = ['hosts', 'networks', 'ranges', 'networkgroups']
@@ -142,17 +243,133 @@ class FMC(FMCRestClient):
         'deployment': ['deployabledevices', 'deploymentrequests']
         }
 
-    def __init__(self, url=None, username=None, password=None):
+    def __init__(self, url=None, username=None, password=None, domain=None):
         """
         Initialize `FMC` object with server `URL`, `username` and `password` parameters.
         """
         super(FMC, self).__init__(url=url, username=username, password=password)
+        self.domain_name = None
+        self.domain_uuid = 'default'
+        self._domain_views = {}
+        self._domain_lock = threading.Lock()
+        if domain is not None:
+            self.domain_name, self.domain_uuid = self.resolve_domain(domain)
+            self.__v1_domain__, self.API_PATH = self.api_paths(self.domain_uuid)
         self.server_version = ''
         self.get_server_version()
+        self._init_tables()
+
+    def _init_tables(self):
         self.obj_tables = OrderedDict()
         for obj_type in self.OBJECT_TYPES:
             self.obj_tables[obj_type] = FPObjectTable(self, type=obj_type)
 
+    @classmethod
+    def api_paths(cls, domain_uuid):
+        """
+        :return: Tuple of domain path and `API_PATH` dictionary for the domain
+        """
+        v1_domain = '/api/fmc_config/v1/domain/' + domain_uuid + '/'
+        api_path = dict((res, v1_domain + res + '/') for res in cls.RESOURCE_TYPES)
+        api_path['audit'] = '/api/fmc_platform/v1/domain/' + domain_uuid + '/audit/'
+        return v1_domain, api_path
+
+    def resolve_domain(self, domain):
+        """
+        Find a domain received at login by its full name, e.g. 'Global/LeafA', by its last name component, e.g.
+        'LeafA', or by its UUID.
+
+        :return: Tuple of domain name and UUID
+        """
+        if domain in self.domains:
+            return domain, self.domains[domain]
+        matches = [
+            (name, uuid) for name, uuid in self.domains.items()
+            if uuid == domain or name.split('/')[-1] == domain]
+        if len(matches) != 1:
+            raise FMCError("FMC domain {} is {}!".format(domain, 'ambiguous' if matches else 'not found'))
+        return matches[0]
+
+    def domain(self, domain):
+        """
+        Return `FMCDomain` view for another domain of this FMC. Views share login session and rate limit of this `FMC`
+        object, but have their own object tables. Views are cached, so repeated calls return the same object.
+
+        ```python
+        >>> leaf = fmc.domain('Global/LeafA')
+        >>> leaf.obj_tables['hosts'].build()
+        ```
+
+        # Parameters
+        domain: Name or UUID of the domain
+        """
+        name, uuid = self.resolve_domain(domain)
+        with self._domain_lock:
+            if uuid not in self._domain_views:
+                self._domain_views[uuid] = FMCDomain(self, name, uuid)
+            return self._domain_views[uuid]
+
+    def map_domains(self, func, domains=None, workers=4):
+        """
+        Call `func` with `FMCDomain` view of each domain concurrently. All calls share the rate limit of this `FMC`
+        object, so FMC is never sent more requests than it allows, however many domains there are.
+
+        ```python
+        >>> counts = fmc.map_domains(lambda d: len(list(d.get_all_resource_instances('object', 'hosts'))))
+        >>> counts
+        OrderedDict([('Global', 12), ('Global/LeafA', 3)])
+        ```
+
+        # Parameters
+        func: Function called with `FMCDomain` as the only argument
+        domains: (optional) Names or UUIDs of the domains, all domains by default
+        workers: Number of domains processed concurrently
+
+        :return: `OrderedDict` of 'domain_name': return value of `func`
+        """
+        views = [self.domain(domain) for domain in (domains or self.domains.keys())]
+        results = map_parallel(func, views, workers=workers)
+        return OrderedDict((view.domain_name, result) for view, result in zip(views, results))
+
+    def build_domain_tables(self, types=None, domains=None, workers=4):
+        """
+        Build object tables of many domains concurrently. Every (domain, type) pair is built by its own task, so one
+        big table does not hold up the others.
+
+        # Parameters
+        types: (optional) Object types to build, all `OBJECT_TYPES` by default
+        domains: (optional) Names or UUIDs of the domains, all domains by default
+        workers: Number of tables built concurrently
+
+        :return: `OrderedDict` of 'domain_name': `FMCDomain`
+        """
+        views = [self.domain(domain) for domain in (domains or self.domains.keys())]
+        tables = [view.obj_tables[obj_type] for view in views for obj_type in (types or self.OBJECT_TYPES)]
+
+        def _build(obj_table):
+            obj_table.build()
+            return len(obj_table.names)
+
+        for obj_table, count in zip(tables, map_parallel(_build, tables, workers=workers)):
+            logger.info("{}: {} {} objects in domain {}".format(
+                self.url, count, obj_table.type, obj_table.fmc.domain_name))
+        return OrderedDict((view.domain_name, view) for view in views)
+
+    def find_domain_objects(self, name, types=None, domains=None):
+        """
+        Look up an object name in the tables built by `build_domain_tables`.
+
+        :return: List of ('domain_name', 'type', 'id') tuples
+        """
+        found = []
+        for domain in (domains or self.domains.keys()):
+            view = self.domain(domain)
+            for obj_type in (types or self.OBJECT_TYPES):
+                oid = view.obj_tables[obj_type].names.get(name)
+                if oid is not None:
+                    found.append((view.domain_name, obj_type, oid))
+        return found
+
     def _req_json(self, resource, type, oid=None, url=None, data=None):
         """
         Simple wrapper for _req with more options to make it resource agnostic and reusable in different classes
@@ -169,6 +386,42 @@ class FMC(FMCRestClient):
             resp = self._req(url, method='POST', data=data)
         return resp
 
+    def bulk_create(self, type, items, chunk_size=1000):
+        """
+        Create many policy objects of one type with one POST request per `chunk_size` objects using '?bulk=true'. If a
+        bulk request fails, e.g. FMC does not support bulk operations for this type, objects of that chunk are created
+        with one POST request each.
+
+        # Parameters
+        type: Object type, e.g. 'hosts'
+        items: List of objects data that will be accepted by Cisco FMC
+        chunk_size: Maximum number of objects per bulk request
+
+        :return: List of created objects JSON
+        """
+        url = self.url + self.API_PATH['object'] + type
+        obj_names = self.obj_tables[type].names
+        created = []
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i:i + chunk_size]
+            logging.warning("Creating {} new {} objects!".format(len(chunk), type))
+            resp = self._req(url + '?bulk=true', method='POST', data=chunk)
+            if len(resp):
+                chunk_created = resp.get('items', [])
+            else:
+                logging.error("Bulk creation of {} {} objects FAILED!! Creating one by one.".format(len(chunk), type))
+                chunk_created = []
+                for data in chunk:
+                    resp = self._req(url, method='POST', data=data)
+                    if len(resp):
+                        chunk_created.append(resp)
+                    else:
+                        logging.error("Creating new {} object: {}! FAILED!!".format(type, data.get('name')))
+            for obj_json in chunk_created:
+                obj_names[obj_json['name']] = obj_json['id']
+            created.extend(chunk_created)
+        return created
+
     def get_server_version(self):
         """
         GET FMC server version.
@@ -180,23 +433,89 @@ class FMC(FMCRestClient):
             logger.info('FMC {} Version is {}'.format(self.url, self.server_version))
 
     # Manage Devices
-    def get_device_list(self):
+    def get_device_list(self, limit=1000):
+        """
+        Get the list of devices managed by FMC, all pages with all the details, i.e. '?expanded=true'.
+
+        :return: List of device records
         """
-        Get the list of devices managed by FMC.
-        :return:
+        return list(self.get_all_resource_instances('devices', 'devicerecords', limit=limit))
+
+    def get_device_details(self, device_id, detail_type, limit=1000):
         """
-        url = self.url + self.API_PATH['devices'] + 'devicerecords'
-        resp = self._req(url)
-        return resp
+        Get the list of sub-resources of a device, e.g. 'physicalinterfaces' or 'subinterfaces'.
+
+        # Parameters
+        device_id: ID of the device record
+        detail_type: Sub-resource of the device record
+        limit: Number of items requested per page
+        """
+        url = self.url + self.API_PATH['devices'] + 'devicerecords/' + device_id + '/' + detail_type
+        return list(self._iter_items(url, expanded=True, limit=limit))
+
+    # Deployment
+    def get_deployable_devices(self):
+        """
+        Get the list of devices with configuration changes that are not deployed yet.
+        """
+        return list(self.get_all_resource_instances('deployment', 'deployabledevices'))
+
+    def deploy(self, device_ids=None, force=False, ignore_warning=True, batch_size=None,
+               callback=None, poller=None, wait=True, timeout=None):
+        """
+        Deploy configuration changes to many devices with as few deployment requests as possible and track resulting
+        tasks with a single `FPTaskPoller`.
+
+        # Parameters
+        device_ids: (optional) IDs of devices to deploy, all deployable devices if omitted
+        force: Force deployment even if there are no changes
+        ignore_warning: Deploy despite warnings
+        batch_size: (optional) Maximum number of devices per deployment request, one request if omitted
+        callback: (optional) Function called with `FPTask` once a deployment task is finished
+        poller: (optional) `FPTaskPoller` to use, e.g. to share it between many deployments
+        wait: Block until all deployment tasks are finished
+        timeout: (optional) Maximum time to wait in seconds, by default until the tasks are finished
+
+        :return: List of `FPTask` objects, one per deployment request
+        """
+        devices = [
+            dev for dev in self.get_deployable_devices()
+            if dev.get('canBeDeployed', True) and (device_ids is None or dev['device']['id'] in device_ids)]
+        if not devices:
+            logger.info("{}: No devices to deploy".format(self.url))
+            return []
+        if poller is None:
+            poller = FPTaskPoller(self)
+        batch_size = batch_size or len(devices)
+        url = self.url + self.API_PATH['deployment'] + 'deploymentrequests'
+        tasks = []
+        for i in range(0, len(devices), batch_size):
+            batch = devices[i:i + batch_size]
+            data = {
+                "type": "DeploymentRequest",
+                "version": max(dev['version'] for dev in batch),
+                "forceDeploy": force,
+                "ignoreWarning": ignore_warning,
+                "deviceList": [dev['device']['id'] for dev in batch]}
+            logging.warning("Deploying configuration to {} devices!".format(len(batch)))
+            resp = self._req(url, method='POST', data=data)
+            if not len(resp):
+                logging.error("Deployment request for {} devices FAILED!!".format(len(batch)))
+                continue
+            task_id = resp['metadata']['task']['id']
+            tasks.append(poller.track(task_id, callback=callback, devices=data['deviceList']))
+        if wait and not poller.wait(timeout):
+            logger.warning("{}: Deployment tasks not finished within {} seconds".format(self.url, timeout))
+        return tasks
 
     # Access Control Policies
     def create_access_policy(self, policy_data):
-        url = self.url + self.API_PATH['devices'] + 'accesspolicies'
+        url = self.url + self.API_PATH['policy'] + 'accesspolicies'
         resp = self._req(url, method='POST', data=policy_data)
         return resp
 
     def get_access_policy(self, oid):
-        url = self.url + self.API_PATH['devices'] + 'accesspolicies/' + oid
+        url = self.url + self.API_PATH['policy'] + 'accesspolicies/' + oid
         resp = self._req(url)
         return resp
 
@@ -204,7 +523,51 @@ class FMC(FMCRestClient):
         # Yield a policy at a time
         return self.get_all_resource_instances('policy', type)
 
-    def get_all_resource_instances(self, resource, type):
+    def get_access_rules(self, policy_id, limit=1000):
+        """
+        Generator function for access rules of an access policy. Rules are yielded in rule order with all the details,
+        i.e. '?expanded=true'.
+
+        # Parameters
+        policy_id: ID of the access policy
+        limit: Number of rules requested per page
+        """
+        url = self.url + self.API_PATH['policy'] + 'accesspolicies/' + policy_id + '/accessrules'
+        return self._iter_items(url, expanded=True, limit=limit)
+
+    def get_nat_rules(self, policy_id, limit=1000):
+        """
+        Generator function for NAT rules, i.e. manual and auto NAT rules, of an FTD NAT policy with all the details.
+
+        # Parameters
+        policy_id: ID of the FTD NAT policy
+        limit: Number of rules requested per page
+        """
+        url = self.url + self.API_PATH['policy'] + 'ftdnatpolicies/' + policy_id + '/natrules'
+        return self._iter_items(url, expanded=True, limit=limit)
+
+    def get_all_access_rules(self, policy_ids=None, workers=4, limit=1000):
+        """
+        Generator function for access rules of many access policies. Rules of different policies are fetched
+        concurrently by `workers` threads sharing the rate limiter of this `FMC` object. Each rule is yielded as soon as
+        its page arrives as a `(policy_id, rule_json)` tuple. Rules of one policy stay in rule order but rules of
+        different policies may be interleaved.
+
+        # Parameters
+        policy_ids: (optional) IDs of access policies, all access policies if omitted
+        workers: Number of policies fetched concurrently
+        limit: Number of rules requested per page
+        """
+        if policy_ids is None:
+            policy_ids = [policy['id'] for policy in self.get_all_policies('accesspolicies')]
+
+        def _policy_rules(policy_id):
+            for rule_json in self.get_access_rules(policy_id, limit=limit):
+                yield policy_id, rule_json
+
+        return iter_parallel(_policy_rules, policy_ids, workers=workers)
+
+    def get_all_resource_instances(self, resource, type, limit=None):
         """
         Abstract generator function for iterating over instances of FMC resource types.
         """
@@ -214,24 +577,93 @@ class FMC(FMCRestClient):
         if type not in self.RESOURCE_TREE[resource]:
             raise FMCError("{} type {} is not valid!".format(resource, type))
 
-        # Fetch the first page
+        url = self.url + self.API_PATH[resource] + type
+        return self._iter_items(url, expanded=True, limit=limit)
+
+    def _iter_pages(self, url, expanded=True, limit=None):
+        """
+        Generator function for paging through a collection of FMC resources. It yields the response of each page.
+
+        # Parameters
+        url: URL of the collection
+        expanded: Request full definition of each item, i.e. '?expanded=true'
+        limit: (optional) Number of items per page, FMC default is 25
+        """
         # By default, URL = url + '?offset=0&limit=25&expanded=false'
-        url = self.url + self.API_PATH[resource] + type + '?expanded=true'
+        query = []
+        if expanded:
+            query.append('expanded=true')
+        if limit:
+            query.append('limit={}'.format(limit))
+        if query:
+            url += ('&' if '?' in url else '?') + '&'.join(query)
         while url:  # True at least first page
             resp = self._req(url)
             if (not len(resp)) or (resp['paging']['count'] == 0):  # Return if No resource found.
                 return
-            for obj_item in resp['items']:
-                # obj = self._req(obj_item['links']['self'])
-                yield obj_item
+            yield resp
             # Move to next page
             if 'next' in resp['paging'].keys():
                 url = resp['paging']['next'][0]
+                # DEFECT: FMC 6.1 does not preserve 'expanded=true' in subsequent URLs
+                if expanded and 'expanded=true' not in url:
+                    url += '&expanded=true'
             else:
                 url = None
+
+    def _iter_items(self, url, expanded=True, limit=None):
+        """
+        Generator function for items of a collection of FMC resources across all pages. Parameters are same as
+        `_iter_pages`.
+        """
+        for resp in self._iter_pages(url, expanded=expanded, limit=limit):
+            for item in resp.get('items', []):
+                yield item
 # End of FMC class
 
 
+class FMCDomain(FMC):
+    """
+    View of an `FMC` object for one of its domains, returned by `FMC.domain`. All `FMC` methods work on the domain,
+    while login session, authentication token and rate limiter are taken from the parent `FMC` object. Hence views
+    are cheap and any number of them can be used concurrently under the one FMC rate limit.
+
+    # Parameters
+    fmc: Parent `FMC` object
+    name: Domain name, e.g. 'Global/LeafA'
+    uuid: Domain UUID
+    """
+    def __init__(self, fmc, name, uuid):
+        # Login is NOT repeated, connection attributes are looked up in parent by __getattr__
+        self.parent = fmc
+        self.domain_name = name
+        self.domain_uuid = uuid
+        self.__v1_domain__, self.API_PATH = self.api_paths(uuid)
+        self._init_tables()
+
+    def __getattr__(self, attr):
+        # Only called for attributes that are not found in the view itself
+        if attr == 'parent':
+            raise AttributeError(attr)
+        return getattr(self.parent, attr)
+
+    def domain(self, domain):
+        return self.parent.domain(domain)
+
+    def login(self, *args, **kwargs):
+        self.parent.login(*args, **kwargs)
+
+    def logout(self, *args, **kwargs):
+        # Session belongs to parent
+        pass
+
+    def reauthenticate(self, token):
+        return self.parent.reauthenticate(token)
+
+    def __repr__(self):
+        return "{}({}, {})".format(self.__class__.__name__, self.url, self.domain_name)
+
+
 # Generic Resource Table related class and methods
 class FPResourceTable(object):
     """
@@ -252,43 +684,27 @@ class FPResourceTable(object):
         self.fmc = fmc
         self.resource = resource
         self.type = type
+        self.path = fmc.API_PATH[resource] + type  # Collection URL without server URL
         self.names = OrderedDict()  # Mapping of 'name':'id'
 
     def __iter__(self):
-        return self.fmc.get_all_resource_instances(self.resource, self.type)
+        return self.fmc._iter_items(self.fmc.url + self.path)
 
-    def build(self):
+    def build(self, expanded=False, limit=1000):
         """
         Build the 'names' dictionary for this table.
         names = {
             'resource1_name': 'resource1_id',
             'resource2_name': 'resource2_id'
             }
+
+        # Parameters
+        expanded: Request full definition of each resource. Names and IDs are part of the summary, so it is not needed.
+        limit: Number of resources requested per page
         """
-        # Fetch the first page. By default,
-        # URL = url + '?offset=0&limit=25&expanded=false'
         logger.info("Building names dictionary for {} {}s".format(self.type, self.resource))
-        _fmc = self.fmc
-        url = _fmc.url + _fmc.API_PATH[self.resource] + self.type + '?expanded=true'
-        while url:  # True at least first page
-            resp = _fmc._req(url)
-            if not len(resp):  # Return if no resource found
-                return
-            if resp['paging']['count'] == 0:  # Return if no resource found
-                return
-
-            for obj_json in resp['items']:
-                self.names[obj_json['name']] = obj_json['id']
-
-            # Move to next page
-            if 'next' in resp['paging'].keys():
-                url = resp['paging']['next'][0]
-                # DEFECT: FMC 6.1 does not preserve 'expanded=true' in subsequent URLs
-                if 'expanded=true' not in url:
-                    url += '&expanded=true'
-                # resp = _fmc._req(url)
-            else:
-                url = None
+        for obj_json in self.fmc._iter_items(self.fmc.url + self.path, expanded=expanded, limit=limit):
+            self.names[obj_json['name']] = obj_json['id']
         logger.debug(self.names)
 # End of FPResourceTable class
 
@@ -326,6 +742,8 @@ class FPObjectTable(FPResourceTable):
         
         """
         super(self.__class__, self).__init__(fmc, 'object', type)
+        self.negative_ttl = 300  # Seconds to remember names that are not found by `lookup`
+        self._missing = {}  # Mapping of 'name': expiry time
 
     def __iter__(self):
         """
@@ -344,50 +762,117 @@ class FPObjectTable(FPResourceTable):
             fp_obj = FPObject(self.fmc, self.type, json=obj_json)
             yield fp_obj
 
-    def build(self):
+    def build(self, expanded=None, limit=1000):
         """
         Build the 'names' dictionary for this table.
         names = {
             'object1_name': 'object1_id',
             'object2_name': 'object2_id'
             }
+
+        Only group types are requested with '?expanded=true', as their members are needed to list children before
+        parents. Other types are built from the much smaller summary of each object.
+
+        # Parameters
+        expanded: (optional) Request full definition of each object, by default only for group types
+        limit: Number of objects requested per page
         """
-        # Fetch the first page. By default,
-        # URL = url + '?offset=0&limit=25&expanded=false'
+        if expanded is None:
+            expanded = self.type in self.fmc.GROUP_OBJECT_TYPES
         logger.info("Building Objects Table for {} {}s".format(self.type, self.resource))
-        _fmc = self.fmc
-        url = _fmc.url + _fmc.API_PATH[self.resource] + self.type + '?expanded=true'
-        while url:  # True at least first page
-            resp = _fmc._req(url)
-            if not len(resp):  # Return if no resource found
-                return
-            if resp['paging']['count'] == 0:  # Return if no resource found
-                return
-            for obj_json in resp['items']:
-                # Make sure children names are listed before parent
-                self.add_child_first(obj_json)
-            # Move to next page
-            if 'next' in resp['paging'].keys():
-                url = resp['paging']['next'][0]
-                # DEFECT: FMC 6.1 does not preserve 'expanded=true' in subsequent URLs
-                if 'expanded=true' not in url:
-                    url += '&expanded=true'
-                    # resp = _fmc._req(url)
-            else:
-                url = None
+        items = self.fmc._iter_items(self.fmc.url + self.path, expanded=expanded, limit=limit)
+        if expanded:
+            # Make sure children names are listed before parent
+            fetched = OrderedDict((obj_json['id'], obj_json) for obj_json in items)
+            for obj_json in fetched.values():
+                self.add_child_first(obj_json, fetched)
+        else:
+            for obj_json in items:
+                self.names[obj_json['name']] = obj_json['id']
         logger.debug(self.names)
 
-    def add_child_first(self, obj_json):
-        if obj_json.get("objects") is not None:
-            for ch_item in obj_json["objects"]:
+    def lookup(self, name):
+        """
+        Find object ID by name without building the whole table. Names missing in the table are searched in FMC with
+        'filter=nameOrValue:' and every object found is added to the table. Names that FMC does not know are
+        remembered for `negative_ttl` seconds, so repeated misses do not cost further requests.
+
+        ```python
+        >>> FMC_object.obj_tables['hosts'].lookup('host1_name')
+        'host1_id'
+        ```
+
+        :return: Object ID or `None` if not found
+        """
+        oid = self.names.get(name)
+        if oid is not None:
+            return oid
+        if self._missing.get(name, 0) > time():
+            return None
+        # Byte strings, e.g. from CSV files, are UTF-8 already
+        query = name.encode('utf-8') if isinstance(name, unicode) else name
+        url = self.fmc.url + self.path + '?filter=nameOrValue:' + quote(query, safe='')
+        # Filter also matches values and parts of names
+        for obj_json in self.fmc._iter_items(url, expanded=False, limit=1000):
+            self.names.setdefault(obj_json['name'], obj_json['id'])
+        oid = self.names.get(name)
+        if oid is None:
+            self._missing[name] = time() + self.negative_ttl
+        return oid
+
+    def invalidate(self, oid=None):
+        """
+        Forget an object that was changed outside of this `FMC` object, e.g. as reported by `FPAuditCollector`. If
+        `oid` is not provided, the whole table is cleared and must be built again.
+
+        # Parameters
+        oid: (optional) ID of the changed object
+        """
+        self.invalidate_missing()
+        if oid is None:
+            self.names.clear()
+            return
+        for obj_name, obj_id in self.names.items():
+            if obj_id == oid:
+                self.names.pop(obj_name)
+
+    def invalidate_missing(self):
+        """
+        Forget names that were not found, e.g. after an object was created outside of this `FMC` object. Names already
+        in the table are kept.
+        """
+        self._missing.clear()  # Name may have been created meanwhile
+
+    def add_child_first(self, obj_json, fetched=None):
+        """
+        Add object to names dictionary after its nested children of the same type.
+
+        # Parameters
+        obj_json: Full object definition
+        fetched: (optional) Mapping of 'id': object JSON of objects already downloaded, other children are requested
+        """
+        fetched = fetched if fetched is not None else {}
+        stack = [(obj_json, False)]
+        visiting = set()  # Guard against cycles
+        while stack:
+            current, children_done = stack.pop()
+            if children_done or current['id'] in visiting:
+                if self.names.get(current['name']) is None:
+                    self.names[current['name']] = current['id']
+                continue
+            if self.names.get(current['name']) is not None:
+                continue
+            visiting.add(current['id'])
+            stack.append((current, True))
+            for ch_item in reversed(current.get('objects') or []):
                 ch_type = ch_item['type'].lower() + 's'
-                if self.type == ch_type:
+                if self.type == ch_type and ch_item['name'] not in self.names:
                     logger.debug("Found nested child {}".format(ch_item['name']))
-                    ch_json = self.fmc._req_json(self.resource, type=self.type, oid=ch_item["id"])
-                    # recursion for multi-level nesting - child-first order
-                    self.add_child_first(ch_json)
-        if self.names.get(obj_json['name']) is None:
-            self.names[obj_json['name']] = obj_json['id']
+                    ch_json = fetched.get(ch_item['id'])
+                    if ch_json is None:
+                        ch_json = self.fmc._req_json(self.resource, type=self.type, oid=ch_item['id'])
+                    if len(ch_json):
+                        stack.append((ch_json, False))
 # End of FPObjectTable class
 
 
@@ -414,6 +899,11 @@ class FPResource(object):
         self.fmc = fmc
         self.resource = resource
         self.type = type
+        if json:
+            # Populate the resource when '?expanded=true' is used in URL
+            self.json = json
+            return
+        self.json = None
 
         resp = self.fmc._req_json(self.resource, type=self.type, oid=oid, url=url, data=data)
 
@@ -422,12 +912,12 @@ class FPResource(object):
             # DEFECT: POST/PUT response does NOT have description in it!!
             self.json = resp
         else:
-            if data.get('name') is not None:
-                logging.error("Creating new {} object: {}! FAILED!!".format(self.type, data['name']))
+            if data is not None and data.get('name') is not None:
+                logging.error("Creating new {} {}: {}! FAILED!!".format(self.type, self.resource, data['name']))
             else:
-                logging.error("FAILED to get {} object!!".format(self.type))
-            return  # new object is not added to the dictionary
-    # End of FPObject.__init__
+                logging.error("FAILED to get {} {}!!".format(self.type, self.resource))
+            return
+    # End of FPResource.__init__
 
     @property
     def url(self):
@@ -510,10 +1000,7 @@ class FPObject(FPResource):
                     for child_obj in data['objects']:
                         # Host -> hosts, Range -> ranges, Url -> urls
                         child_type = child_obj['type'].lower() + 's'
-                        # Assumption is that the dictionary of 'name':'id'
-                        # mapping is already populated
-                        child_names = self.fmc.obj_tables[child_type].names
-                        child_obj['id'] = child_names[child_obj['name']]
+                        child_obj['id'] = self.fmc.obj_tables[child_type].lookup(child_obj['name'])
         elif type is not None and (type in self.fmc.OBJECT_TYPES):
             # If 'obj' is provided, then ignore 'type' parameter
             self.type = type
@@ -521,7 +1008,9 @@ class FPObject(FPResource):
             logging.fatal("Object type not defined!!")
 
         if name is not None:
-            oid = self.fmc.obj_tables[self.type].names[name]
+            oid = self.fmc.obj_tables[self.type].lookup(name)
+            if oid is None:
+                raise FMCError("{}: {} object {} not found!".format(self.fmc.url, self.type, name))
             logging.debug("Looking for name {} and found id {}".format(name, oid))
 
         resp = self.fmc._req_json(resource='object', type=self.type, oid=oid, url=url, data=data)
@@ -614,10 +1103,9 @@ class FPObject(FPResource):
         """
         children_types = self.fmc.CHILD_OBJECT_TYPES[self.type]
         for child_type in children_types:
-            if child_name in self.fmc.obj_tables[child_type].names.keys():
-                return FPObject(
-                    self.fmc, type=child_type,
-                    oid=self.fmc.obj_tables[child_type].names[child_name])
+            oid = self.fmc.obj_tables[child_type].lookup(child_name)
+            if oid is not None:
+                return FPObject(self.fmc, type=child_type, oid=oid)
 
     def _update_json(self):
         """
@@ -699,13 +1187,11 @@ class FPObject(FPResource):
             logging.error("Cannot add to invalid parent {}".format(pname))
             return pname
         parent_type = self.parent_type
-        if pname not in self.fmc.obj_tables[parent_type].names.keys():
+        parent_id = self.fmc.obj_tables[parent_type].lookup(pname)
+        if parent_id is None:
             logging.error("Could not find parent {} in FMC".format(pname))
             return pname
-        parent_obj = FPObject(
-            self.fmc, 
-            type=parent_type,
-            oid=self.fmc.obj_tables[parent_type].names[pname])
+        parent_obj = FPObject(self.fmc, type=parent_type, oid=parent_id)
         put_data = parent_obj.json.copy()
         for obj_key in ['links', 'metadata']:
             put_data.pop(obj_key)
@@ -733,13 +1219,11 @@ class FPObject(FPResource):
             logging.error("Cannot add to invalid parent {}".format(pname))
             return pname
         parent_type = self.parent_type
-        if pname not in self.fmc.obj_tables[parent_type].names.keys():
+        parent_id = self.fmc.obj_tables[parent_type].lookup(pname)
+        if parent_id is None:
             logging.error("Could not find parent {} in FMC".format(pname))
             return
-        parent_obj = FPObject(
-            self.fmc, 
-            type=parent_type,
-            oid=self.fmc.obj_tables[parent_type].names[pname])
+        parent_obj = FPObject(self.fmc, type=parent_type, oid=parent_id)
         put_data = parent_obj.json.copy()
         if 'objects' not in put_data.keys():
             logging.error("Parent {} has no children to remove".format(pname))
@@ -770,117 +1254,68 @@ class FPPolicyTable(FPResourceTable):
 
 class FPAccessRulesTable(FPResourceTable):
     """
-    Work In Progress
+    Extends `FPResourceTable` for access rules of an access policy. Names dictionary and iteration are in rule order.
+
+    ```python
+    >>> rules = FPAccessRulesTable(FMC_object, policy_id)
+    >>> rules.build()
+    >>> rules.names
+    {'rule1_name': 'rule1_id', 'rule2_name': 'rule2_id', ...}
+    ```
     """
     def __init__(self, fmc, uuid):
+        super(FPAccessRulesTable, self).__init__(fmc, 'policy', 'accesspolicies')
         self.access_policy_uuid = uuid
-        resource_type = 'policy/' + self.access_policy_uuid + '/accessrules'
-        super(self.__class__, self).__init__(fmc, resource_type, type)
-
-
-class FPAccessPolicy(object):
-    """
-    Work In Progress
-    """
-    def __init__(self, fmc, data=None, json=None, uuid=None, url=None, obj=None):
-        """
-        FMC Access Policy object
+        self.path += '/' + self.access_policy_uuid + '/accessrules'
 
-        :param fmc:
-        :param data:
-        :param json:
-        :param uuid:
-        :param url:
-        :param obj:
-        """
-        if not (uuid or url or data or obj or json):
-            logger.fatal("Cannot get FPObject with empty parameters")
-            return
-        self.fmc = fmc
-        if json:
-            # Populate the object when '?expanded=true' is used in URL
-            self.json = json
-            # Update names dictionary
-            # obj_names = self.fmc.obj_tables[self.type].names
-            # obj_names[self.name] = self.id
-            return
-        self.json = None
-
-        if obj:
-            # This option helps duplicating objects from one FMC to
-            # another FMC
-            self.type = obj.type
-            if obj.name in self.fmc.obj_tables[self.type].names.keys():
-                logging.warning("{}: Object name {} already exists!".format(self.fmc.url, obj.name))
-                # Fetch the existing object using known object ID
-                oid = self.fmc.obj_tables[self.type].names[obj.name]
-            else:
-                data = obj.json.copy()
-                for obj_key in ['id', 'links', 'metadata']:
-                    data.pop(obj_key)
-                if 'objects' in data.keys():
-                    # Update child object IDs
-                    for child_obj in data['objects']:
-                        # Host -> hosts, Range -> ranges, Url -> urls
-                        child_type = child_obj['type'].lower() + 's'
-                        # Assumption is that the dictionary of 'name':'id'
-                        # mapping is already populated
-                        child_names = self.fmc.obj_tables[child_type].names
-                        child_obj['id'] = child_names[child_obj['name']]
-        else:
-            logging.fatal("Object type not defined!!")
+    def __iter__(self):
+        return self.fmc.get_access_rules(self.access_policy_uuid)
 
-        resp = self.fmc._req_json(resource='policy', oid=oid, url=url, data=data)
 
-        if len(resp):
-            # True only if GET/POST operation was successful
-            # DEFECT: POST/PUT response does NOT have description in it!!
-            self.json = resp
-            # Update names dictionary
-            obj_names = self.fmc.obj_tables[self.type].names
-            obj_names[self.name] = self.id
-        else:
-            if data.get('name') is not None:
-                logging.error("Creating new {} object: {}! FAILED!!".format(self.type, data['name']))
-            else:
-                logging.error("FAILED to get {} object: {}!!".format(self.type, obj.name))
-            return  # new object is not added to the dictionary
+class FPAccessPolicy(FPResource):
+    """
+    FMC Access Policy API
 
-    # End of FPObject.__init__
+    Extends generic `FPResource` for access policy related methods.
 
-    @property
-    def url(self):
-        return self.json['links']['self']
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    oid: (optional) Access policy ID, GET the policy if provided.
+    url: (optional) URL for the policy, GET the policy if provided.
+    json: (optional) Full policy definition in `dict` format.
+    data: (optional) Data that will be accepted by Cisco FMC to create policy when POST method is used.
+    """
+    def __init__(self, fmc, oid=None, url=None, json=None, data=None):
+        super(FPAccessPolicy, self).__init__(
+            fmc, 'policy', 'accesspolicies', oid=oid, url=url, data=data, json=json)
 
     @property
-    def name(self):
-        return self.json['name']
+    def rules(self):
+        """
+        Generator of access rules of this policy in rule order.
+        """
+        return self.fmc.get_access_rules(self.id)
 
     @property
-    def id(self):
-        return self.json['id']
-
-    def __str__(self):
-        return str(self.json)
-
-    def __repr__(self):
-        return "{}(type={}, name={}, id={})".format(
-            self.__class__.__name__, self.type, self.name, self.id)
+    def rules_table(self):
+        """
+        `FPAccessRulesTable` for this policy.
+        """
+        return FPAccessRulesTable(self.fmc, self.id)
 
 
 class FPDeviceTable(FPResourceTable):
     """
-    Work In Progress
+    Extends `FPResourceTable` for device records. Names dictionary holds 'device_name': 'device_id' mapping. Use
+    `FPDeviceInventory` for device details.
     """
-    def __init__(self, fmc, type):
-        super(self.__class__, self).__init__(fmc, 'devices', type)
+    def __init__(self, fmc, type='devicerecords'):
+        super(FPDeviceTable, self).__init__(fmc, 'devices', type)
 
 
 class FPDeviceGroupTable(FPResourceTable):
     """
-    Work In Progress
+    Extends `FPResourceTable` for device groups. Names dictionary holds 'group_name': 'group_id' mapping.
     """
-    def __init__(self, fmc, type):
-        super(self.__class__, self).__init__(fmc, 'devicegrouprecords', type)
-
-
+    def __init__(self, fmc, type='devicegrouprecords'):
+        super(FPDeviceGroupTable, self).__init__(fmc, 'devicegroups', type)
@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NDJSONSink(object):
+    """
+    Append audit records to a file, one JSON document per line.
+
+    # Parameters
+    filename: Path of the NDJSON file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'a')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class SQLiteSink(object):
+    """
+    Store audit records in SQLite table `auditrecords`. Records are keyed by ID, so records collected twice, e.g.
+    after an interrupted run, are stored only once.
+
+    # Parameters
+    filename: Path of the SQLite database
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS auditrecords ("
+            "id TEXT PRIMARY KEY, time INTEGER, username TEXT, subsystem TEXT, source TEXT, message TEXT, json TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS auditrecords_time ON auditrecords (time)")
+
+    def write(self, record):
+        self._db.execute(
+            "INSERT OR IGNORE INTO auditrecords VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record['id'], record.get('time'), record.get('username'), record.get('subsystem'),
+             record.get('source'), record.get('message'), json.dumps(record, sort_keys=True)))
+
+    def flush(self):
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+class FPAuditCollector(object):
+    """
+    Incrementally collect FMC audit records. Each run pages through `audit/auditrecords` newest first and stops as soon
+    as it reaches the watermark of the previous run, so only new records are downloaded. The watermark, i.e. time of the
+    newest record and IDs of the records with that time, is stored in a JSON file and advanced only after the sink has
+    been flushed. An interrupted run is repeated next time, so records are delivered at least once.
+
+    Records that change policy objects are turned into invalidation events for subscribers:
+
+    ```python
+    {'type': 'networks', 'id': 'object_id', 'method': 'PUT', 'time': 1480000000, 'record': {...}}
+    ```
+
+    `type` and `id` are `None` if the record does not tell which object type or object was changed.
+    `table_invalidator` returns a subscriber that keeps `FMC.obj_tables` up to date this way.
+
+    ```python
+    >>> collector = FPAuditCollector(FMC_object, 'audit.watermark', SQLiteSink('audit.db'))
+    >>> collector.subscribe(table_invalidator(FMC_object))
+    >>> collector.collect()
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    watermark_file: Path of the JSON file that keeps the watermark between runs
+    sink: (optional) `NDJSONSink`, `SQLiteSink` or any object with `write` and `flush` methods
+    since: (optional) Epoch time of oldest record to collect if there is no watermark yet
+    limit: Number of records requested per page
+    """
+    OBJECT_PATTERN = re.compile(r'/object/(?P<type>[a-z0-9]+)(?:/(?P<id>[0-9a-fA-F-]{36}))?')
+    METHOD_PATTERN = re.compile(r'\b(?P<method>POST|PUT|DELETE)\b')
+
+    def __init__(self, fmc, watermark_file, sink=None, since=None, limit=1000):
+        self.fmc = fmc
+        self.watermark_file = watermark_file
+        self.sink = sink
+        self.limit = limit
+        self.subscribers = []
+        self.watermark = {'time': since or 0, 'ids': []}
+        if os.path.exists(watermark_file):
+            with open(watermark_file) as f:
+                self.watermark = json.load(f)
+
+    def subscribe(self, callback):
+        """
+        Register a function to be called with every invalidation event.
+        """
+        self.subscribers.append(callback)
+
+    def _new_records(self):
+        """
+        Generator of records newer than the watermark, newest first.
+        """
+        wm_time = self.watermark['time']
+        wm_ids = set(self.watermark['ids'])
+        url = self.fmc.url + self.fmc.API_PATH['audit'] + 'auditrecords'
+        for record in self.fmc._iter_items(url, expanded=True, limit=self.limit):
+            if record['time'] < wm_time:
+                return  # Stop paging, everything beyond is known
+            if record['time'] == wm_time and record['id'] in wm_ids:
+                continue
+            yield record
+
+    def _save_watermark(self):
+        tmp_file = self.watermark_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.watermark, f)
+        os.rename(tmp_file, self.watermark_file)
+
+    def event(self, record):
+        """
+        Convert audit record into invalidation event, or `None` if it does not change policy objects.
+        """
+        message = record.get('message') or ''
+        match = self.OBJECT_PATTERN.search(message)
+        method = self.METHOD_PATTERN.search(message)
+        if match:
+            if method is None:  # e.g. GET
+                return None
+            return {'type': match.group('type'), 'id': match.group('id'), 'method': method.group('method'),
+                    'time': record['time'], 'record': record}
+        if 'object' in (record.get('subsystem') or '').lower():  # Change made in FMC UI
+            return {'type': None, 'id': None, 'method': None, 'time': record['time'], 'record': record}
+        return None
+
+    def collect(self):
+        """
+        Collect new audit records into the sink and notify subscribers.
+
+        :return: Number of new records
+        """
+        count = 0
+        newest_time = None
+        newest_ids = []
+        for record in self._new_records():
+            if newest_time is None:
+                newest_time = record['time']
+            if record['time'] == newest_time:
+                newest_ids.append(record['id'])
+            if self.sink is not None:
+                self.sink.write(record)
+            event = self.event(record)
+            if event is not None:
+                for callback in self.subscribers:
+                    callback(event)
+            count += 1
+
+        if count:
+            if self.sink is not None:
+                self.sink.flush()
+            if newest_time == self.watermark['time']:
+                newest_ids.extend(self.watermark['ids'])
+            self.watermark = {'time': newest_time, 'ids': newest_ids}
+            self._save_watermark()
+        logger.info("{}: Collected {} new audit records".format(self.fmc.url, count))
+        return count
+
+    def tail(self, interval=60, stop=None):
+        """
+        Collect new audit records every `interval` seconds until `stop` (`threading.Event`) is set.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.collect()
+            stop.wait(interval)
+
+
+def table_invalidator(fmc):
+    """
+    Return a subscriber for `FPAuditCollector` that invalidates changed objects in `fmc.obj_tables`. If object type is
+    not known, all the tables are invalidated. Creates, which have no object ID, only invalidate names not found.
+    """
+    def _invalidate(event):
+        if event['type'] is None:
+            for obj_table in fmc.obj_tables.values():
+                obj_table.invalidate()
+        elif event['type'] in fmc.obj_tables:
+            if event['id'] is None:
+                fmc.obj_tables[event['type']].invalidate_missing()
+            else:
+                fmc.obj_tables[event['type']].invalidate(event['id'])
+    return _invalidate
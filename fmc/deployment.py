@@ -0,0 +1,180 @@
+from time import sleep, time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FPTask(object):
+    """
+    Status of an FMC job, e.g. policy deployment, as reported by `job/taskstatuses`.
+
+    # Parameters
+    task_id: Task ID returned by FMC
+    devices: (optional) IDs of devices covered by this task
+    """
+    # FMC reports status strings in different spelling for different task types
+    SUCCESS_STATUSES = ['deployed', 'success', 'succeeded', 'completed']
+    FAILURE_STATUSES = ['failed', 'failure', 'deployment failed', 'cancelled']
+
+    def __init__(self, task_id, devices=None):
+        self.id = task_id
+        self.devices = devices or []
+        self.json = None
+        self.status = None
+        self.callbacks = []
+        self.next_poll = 0  # Time of next status check
+        self.interval = 0  # Current polling interval
+
+    @property
+    def message(self):
+        if self.json:
+            return self.json.get('message')
+
+    @property
+    def done(self):
+        return self.succeeded or self.failed
+
+    @property
+    def succeeded(self):
+        return self.status is not None and self.status.lower() in self.SUCCESS_STATUSES
+
+    @property
+    def failed(self):
+        return self.status is not None and self.status.lower() in self.FAILURE_STATUSES
+
+    def __repr__(self):
+        return "{}(id={}, status={}, devices={})".format(
+            self.__class__.__name__, self.id, self.status, len(self.devices))
+
+
+class FPTaskPoller(object):
+    """
+    Track any number of FMC tasks from a single background thread. Each task has its own polling interval that starts
+    at `min_interval` and is multiplied by `backoff`, up to `max_interval`, every time the task status is unchanged.
+    Polls are additionally spaced so that the poller does not use more than `budget_share` of the `FMC` rate limit,
+    leaving the rest for other requests.
+
+    Callbacks are called from the poller thread with the finished `FPTask` as the only argument.
+
+    ```python
+    >>> poller = FPTaskPoller(FMC_object)
+    >>> poller.track(task_id, callback=lambda task: print(task))
+    >>> poller.wait()
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    min_interval: Initial polling interval per task in seconds
+    max_interval: Maximum polling interval per task in seconds
+    backoff: Multiplier for polling interval while task status is unchanged
+    budget_share: Maximum share of FMC rate limit used by the poller
+    """
+    def __init__(self, fmc, min_interval=5, max_interval=60, backoff=2, budget_share=0.5):
+        self.fmc = fmc
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        limiter = fmc.rate_limiter
+        self.min_gap = float(limiter.period) / (limiter.max_requests * budget_share)
+        self.tasks = {}  # Mapping of 'id': FPTask for pending tasks
+        self.finished = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def track(self, task_id, callback=None, devices=None):
+        """
+        Start tracking a task.
+
+        # Parameters
+        task_id: Task ID returned by FMC
+        callback: (optional) Function called with `FPTask` once the task is finished
+        devices: (optional) IDs of devices covered by the task
+
+        :return: `FPTask` object
+        """
+        with self._cond:
+            task = self.tasks.get(task_id)
+            if task is None:
+                task = FPTask(task_id, devices)
+                task.interval = self.min_interval
+                task.next_poll = time()
+                self.tasks[task_id] = task
+            if callback is not None:
+                task.callbacks.append(callback)
+            self._cond.notify_all()
+        self.start()
+        return task
+
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='FPTaskPoller')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def wait(self, timeout=None):
+        """
+        Block until all tracked tasks are finished.
+
+        :return: `True` if all tasks are finished, `False` on timeout
+        """
+        deadline = None if timeout is None else time() + timeout
+        with self._cond:
+            while self.tasks:
+                if deadline is None:
+                    self._cond.wait(1)
+                else:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(min(1, remaining))
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self.tasks:
+                    self._thread = None
+                    return
+                task = min(self.tasks.values(), key=lambda t: t.next_poll)
+                delay = task.next_poll - time()
+                if delay > 0:
+                    # Wake up early if another task is tracked meanwhile
+                    self._cond.wait(delay)
+                    continue
+            try:
+                self._poll(task)
+            except Exception:
+                # Keep polling, e.g. after connection errors or HTTP 5xx, instead of leaving `wait` blocked forever
+                logger.exception("Polling FMC task {} failed".format(task.id))
+                task.interval = min(task.interval * self.backoff, self.max_interval)
+                task.next_poll = time() + task.interval
+            sleep(self.min_gap)  # Leave rate budget for other requests
+
+    def _poll(self, task):
+        url = self.fmc.url + self.fmc.API_PATH['job'] + 'taskstatuses/' + task.id
+        resp = self.fmc._req(url)
+        status = resp.get('status') if len(resp) else None
+        if status is not None and status != task.status:
+            logger.info("FMC task {} status: {}".format(task.id, status))
+            task.interval = self.min_interval
+        else:
+            task.interval = min(task.interval * self.backoff, self.max_interval)
+        if len(resp):
+            task.json = resp
+            task.status = status
+        task.next_poll = time() + task.interval
+
+        if task.done:
+            if task.failed:
+                logger.error("FMC task {} {}: {}".format(task.id, task.status, task.message))
+            for callback in task.callbacks:
+                try:
+                    callback(task)
+                except Exception:
+                    logger.exception("Callback for FMC task {} failed".format(task.id))
+            with self._cond:
+                self.tasks.pop(task.id, None)
+                self.finished.append(task)
+                self._cond.notify_all()
@@ -0,0 +1,346 @@
+import re
+import csv
+import hashlib
+import logging
+from collections import OrderedDict
+from netaddr import IPNetwork, AddrFormatError, cidr_merge, valid_ipv4, valid_ipv6, INET_PTON
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_network(value):
+    """
+    Validate an IP address or CIDR. Host bits of networks are cleared, e.g. '10.1.1.5/24' becomes '10.1.1.0/24'.
+    Unlike `IPNetwork`, abbreviated addresses such as '10.1' are not accepted.
+
+    :return: `IPNetwork` object
+    """
+    addr, sep, prefix = value.strip().partition('/')
+    if not (addr and (valid_ipv4(addr, flags=INET_PTON) or valid_ipv6(addr))):
+        raise ValueError("invalid IP address {}".format(addr))
+    if sep and not prefix.isdigit():
+        raise ValueError("invalid prefix length {}".format(prefix))
+    try:
+        return IPNetwork(value.strip()).cidr
+    except AddrFormatError as err:
+        raise ValueError(str(err))
+
+
+def network_literal(network):
+    """
+    :return: Network group literal for `IPNetwork`, 'Host' for single addresses
+    """
+    if network.size == 1:
+        return {'type': 'Host', 'value': str(network.ip)}
+    return {'type': 'Network', 'value': str(network)}
+
+
+class FPNetworkGroupImporter(object):
+    """
+    Import network groups from a CSV file with one row per group member, e.g.
+
+    ```
+    subnet_cidr,subnet_nwog
+    192.168.10.0/23,TEST.NETWORK-GROUP_1
+    10.10.10.0/28,TEST.NETWORK-GROUP_2
+    ```
+
+    The file is streamed and handled `chunk_rows` rows at a time, so memory does not grow with file size. Values are
+    validated locally, invalid rows are logged and skipped. CIDRs of each group are normalized and merged, i.e.
+    duplicates, networks contained in other networks and adjacent networks are collapsed. For each chunk, new groups
+    are created with bulk POSTs and existing groups, including groups created by earlier chunks, are updated with one
+    merged PUT each, only if their content changes. Rows of a group should be next to each other in the file to keep
+    the number of requests to a minimum.
+
+    ```python
+    >>> importer = FPNetworkGroupImporter(FMC_object)
+    >>> importer.run('workstation_subnets.csv')
+    {'rows': 1000000, 'invalid': 3, 'created': 420, 'updated': 0, 'unchanged': 0}
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    chunk_rows: Number of CSV rows handled at a time
+    group_column: CSV column with network group names
+    value_column: CSV column with IP addresses or CIDRs
+    overridable: Value of 'overridable' for new groups
+    merge: Collapse contained and adjacent networks, otherwise only duplicates are removed
+    """
+    def __init__(self, fmc, chunk_rows=50000, group_column='subnet_nwog', value_column='subnet_cidr',
+                 overridable=True, merge=True):
+        self.fmc = fmc
+        self.chunk_rows = chunk_rows
+        self.group_column = group_column
+        self.value_column = value_column
+        self.overridable = overridable
+        self.merge = merge
+        self.stats = dict((key, 0) for key in ['rows', 'invalid', 'created', 'updated', 'unchanged'])
+
+    def read(self, csvfile):
+        """
+        Generator function for valid rows of CSV file. It yields ('group_name', `IPNetwork`).
+
+        # Parameters
+        csvfile: Path of CSV file or file object
+        """
+        if isinstance(csvfile, basestring):
+            with open(csvfile) as f:
+                for row in self.read(f):
+                    yield row
+            return
+        for line, row in enumerate(csv.DictReader(csvfile), 2):
+            self.stats['rows'] += 1
+            name = (row.get(self.group_column) or '').strip()
+            value = row.get(self.value_column) or ''
+            try:
+                if not name:
+                    raise ValueError("missing group name")
+                yield name, normalize_network(value)
+            except ValueError as err:
+                self.stats['invalid'] += 1
+                logger.error("Line {}: Skipping {} {}: {}".format(line, name, value.strip(), err))
+
+    def run(self, csvfile):
+        """
+        Import all the groups of CSV file.
+
+        :return: Import statistics
+        """
+        self.stats = dict((key, 0) for key in self.stats)
+        obj_table = self.fmc.obj_tables['networkgroups']
+        if not obj_table.names:
+            obj_table.build()
+        groups = OrderedDict()  # Mapping of 'group_name': set of networks for current chunk
+        count = 0
+        for name, network in self.read(csvfile):
+            groups.setdefault(name, set()).add(network)
+            count += 1
+            if count >= self.chunk_rows:
+                self._flush(groups)
+                groups = OrderedDict()
+                count = 0
+        self._flush(groups)
+        logger.info("{}: Network group import: {}".format(self.fmc.url, self.stats))
+        return self.stats
+
+    def _literals(self, networks):
+        networks = cidr_merge(networks) if self.merge else sorted(networks)
+        return [network_literal(network) for network in networks]
+
+    def _flush(self, groups):
+        if not groups:
+            return
+        obj_names = self.fmc.obj_tables['networkgroups'].names
+        new_groups = []
+        for name, networks in groups.items():
+            if name in obj_names:
+                self._update(obj_names[name], networks)
+            else:
+                new_groups.append({
+                    'name': name, 'type': 'NetworkGroup', 'overridable': self.overridable,
+                    'literals': self._literals(networks)})
+        if new_groups:
+            created = self.fmc.bulk_create('networkgroups', new_groups)
+            self.stats['created'] += len(created)
+
+    def _update(self, oid, networks):
+        url = self.fmc.url + self.fmc.API_PATH['object'] + 'networkgroups/' + oid
+        group_json = self.fmc._req(url)
+        if not len(group_json):
+            logger.error("FAILED to get networkgroups object: {}!!".format(oid))
+            return
+        current = set()
+        other_literals = []  # Literals that are kept as they are, e.g. ranges
+        for literal in group_json.get('literals', []):
+            try:
+                current.add(normalize_network(literal['value']))
+            except ValueError:
+                other_literals.append(literal)
+        if networks <= current or (self.merge and cidr_merge(current | networks) == cidr_merge(current)):
+            self.stats['unchanged'] += 1
+            return
+        data = dict((k, v) for k, v in group_json.items() if k not in ['links', 'metadata'])
+        data['literals'] = self._literals(current | networks) + other_literals
+        logging.warning("Updating networkgroups object {}!".format(group_json['name']))
+        if len(self.fmc._req(group_json['links']['self'], method='PUT', data=data)):
+            self.stats['updated'] += 1
+
+
+def normalize_url(value):
+    """
+    Validate a URL of a feed and return it in canonical form, i.e. scheme and host in lower case, without trailing dot
+    of host and without '/' as the only path.
+
+    :return: URL, `None` for blank lines and comments
+    """
+    url = value.strip()
+    if not url or url.startswith('#'):
+        return None
+    if any(c.isspace() for c in url):
+        raise ValueError("URL must not contain white spaces")
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        scheme, rest = '', url
+    host, slash, path = rest.partition('/')
+    host = host.lower().rstrip('.')
+    if not host or host.startswith('.') or '..' in host:
+        raise ValueError("invalid host {}".format(host))
+    return (scheme.lower() + '://' if sep else '') + host + (slash + path if path else '')
+
+
+class FPURLFeedImporter(object):
+    """
+    Keep URL objects and groups in FMC in sync with a URL feed file, e.g. threat intelligence list with one URL per
+    line.
+
+    Each URL of the feed becomes a `urls` object named after a hash of the normalized URL, e.g. 'feed_3f786850e387550f',
+    so the objects of the feed are told apart from other URL objects by `prefix` alone and a URL is never created
+    twice. The objects are packed into `urlgroups` named 'feed-0001', 'feed-0002', etc. of at most `group_size`
+    members each.
+
+    Every run only touches the delta between the feed and the objects tables of `FMC` object: new URLs are created with
+    bulk POSTs and added to free slots of existing groups, URLs missing in the feed are removed from their groups and
+    deleted. Only groups whose members change are updated.
+
+    ```python
+    >>> importer = FPURLFeedImporter(FMC_object, 'feed')
+    >>> importer.run('urls.txt')
+    {'lines': 250000, 'invalid': 12, 'created': 1200, 'deleted': 800, 'groups_created': 0, 'groups_updated': 5, ...}
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    prefix: Name prefix of URL objects and groups owned by this feed
+    group_size: Maximum number of URL objects per group
+    chunk_size: Maximum number of objects per bulk request
+    delete: Delete URL objects and groups that are no longer needed
+    """
+    def __init__(self, fmc, prefix, group_size=1000, chunk_size=1000, delete=True):
+        self.fmc = fmc
+        self.prefix = prefix
+        self.group_size = group_size
+        self.chunk_size = chunk_size
+        self.delete = delete
+        self.group_pattern = re.compile(r'^' + re.escape(prefix) + r'-\d{4,}$')
+        self.stats = dict((key, 0) for key in [
+            'lines', 'invalid', 'created', 'deleted', 'groups_created', 'groups_updated', 'groups_deleted'])
+
+    def object_name(self, url):
+        return '{}_{}'.format(self.prefix, hashlib.sha1(url).hexdigest()[:16])
+
+    def group_name(self, index):
+        return '{}-{:04d}'.format(self.prefix, index)
+
+    def read(self, feed):
+        """
+        Generator function for normalized URLs of feed file.
+
+        # Parameters
+        feed: Path of feed file or file object
+        """
+        if isinstance(feed, basestring):
+            with open(feed) as f:
+                for url in self.read(f):
+                    yield url
+            return
+        for line, value in enumerate(feed, 1):
+            self.stats['lines'] += 1
+            try:
+                url = normalize_url(value)
+            except ValueError as err:
+                self.stats['invalid'] += 1
+                logger.error("Line {}: Skipping {}: {}".format(line, value.strip(), err))
+                continue
+            if url is not None:
+                yield url
+
+    def run(self, feed):
+        """
+        Bring URL objects and groups of this feed in sync with feed file.
+
+        :return: Import statistics
+        """
+        self.stats = dict((key, 0) for key in self.stats)
+        url_names = self.fmc.obj_tables['urls'].names
+        if not url_names:
+            self.fmc.obj_tables['urls'].build()
+        desired = OrderedDict()  # Mapping of 'object_name': 'url'
+        for url in self.read(feed):
+            desired.setdefault(self.object_name(url), url)
+
+        # Delta against the objects table
+        stale = set(name for name in url_names if name.startswith(self.prefix + '_') and name not in desired)
+        new = [
+            {'name': name, 'type': 'Url', 'url': url, 'description': 'Created from {} feed'.format(self.prefix)}
+            for name, url in desired.items() if name not in url_names]
+        if new:
+            self.stats['created'] += len(self.fmc.bulk_create('urls', new, chunk_size=self.chunk_size))
+        self._pack(desired, stale)
+        if self.delete:
+            for name in sorted(stale):
+                url = self.fmc.url + self.fmc.API_PATH['object'] + 'urls/' + url_names[name]
+                logging.warning("Deleting urls object: {}!".format(name))
+                if len(self.fmc._req(url, method='DELETE')):
+                    url_names.pop(name, None)
+                    self.stats['deleted'] += 1
+        logger.info("{}: URL feed {} import: {}".format(self.fmc.url, self.prefix, self.stats))
+        return self.stats
+
+    def _pack(self, desired, stale):
+        """
+        Update group membership: keep members that are still in the feed and fill free slots with ungrouped URLs.
+        """
+        url_names = self.fmc.obj_tables['urls'].names
+        url = self.fmc.url + self.fmc.API_PATH['object'] + 'urlgroups'
+        groups = OrderedDict(
+            (group_json['name'], group_json)
+            for group_json in sorted(self.fmc._iter_items(url, expanded=True, limit=1000), key=lambda g: g['name'])
+            if self.group_pattern.match(group_json['name']))
+        members = OrderedDict()  # Mapping of 'group_name': list of object names
+        grouped = set()
+        for name, group_json in groups.items():
+            members[name] = [ref['name'] for ref in group_json.get('objects', []) if ref['name'] not in stale]
+            grouped.update(members[name])
+        ungrouped = [name for name in desired if name not in grouped and name in url_names]
+
+        changed = set(name for name, group_json in groups.items()
+                      if len(members[name]) != len(group_json.get('objects', [])))
+        for name in members:
+            free = self.group_size - len(members[name])
+            if free > 0 and ungrouped:
+                members[name].extend(ungrouped[:free])
+                ungrouped = ungrouped[free:]
+                changed.add(name)
+        index = len(members)
+        new_groups = []
+        while ungrouped:
+            index += 1
+            while self.group_name(index) in members:
+                index += 1
+            members[self.group_name(index)] = ungrouped[:self.group_size]
+            new_groups.append(self.group_name(index))
+            ungrouped = ungrouped[self.group_size:]
+
+        def _objects(group_name):
+            return [{'type': 'Url', 'name': name, 'id': url_names[name]} for name in members[group_name]]
+
+        for name in sorted(changed):
+            group_json = groups[name]
+            if not members[name]:
+                continue  # Deleted below, FMC does not allow empty groups
+            data = dict((k, v) for k, v in group_json.items() if k not in ['links', 'metadata'])
+            data['objects'] = _objects(name)
+            logging.warning("Updating urlgroups object {}!".format(name))
+            if len(self.fmc._req(group_json['links']['self'], method='PUT', data=data)):
+                self.stats['groups_updated'] += 1
+        if new_groups:
+            created = self.fmc.bulk_create('urlgroups', [
+                {'name': name, 'type': 'UrlGroup', 'objects': _objects(name)} for name in new_groups],
+                chunk_size=self.chunk_size)
+            self.stats['groups_created'] += len(created)
+        if self.delete:
+            for name in [name for name in groups if not members[name]]:
+                logging.warning("Deleting urlgroups object: {}!".format(name))
+                if len(self.fmc._req(groups[name]['links']['self'], method='DELETE')):
+                    self.fmc.obj_tables['urlgroups'].names.pop(name, None)
+                    self.stats['groups_deleted'] += 1
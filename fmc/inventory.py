@@ -0,0 +1,129 @@
+import os
+import json
+from time import time
+import logging
+from rest import iter_parallel
+
+logger = logging.getLogger(__name__)
+
+
+class FPDeviceInventory(object):
+    """
+    Cache of devices managed by FMC together with their interfaces, security zones and assigned policies.
+
+    `refresh` pages all device records with one request per 1000 devices and fetches policy assignments once for all
+    devices. Per-device details, i.e. `DETAIL_TYPES`, are fetched concurrently and only for devices that are new or
+    whose cache entry is older than `ttl`. With `cache_file`, the cache survives between runs, so repeated fleet
+    reports only pay for what has expired.
+
+    Each device entry is a `dict`:
+
+    ```python
+    {'record': {...},                   # Device record
+     'physicalinterfaces': [...],       # One list per DETAIL_TYPES
+     'subinterfaces': [...],
+     'zones': ['inside', 'outside'],    # Security zones of the interfaces
+     'policies': [{'type': 'AccessPolicy', 'name': ..., 'id': ...}],
+     'fetched': 1480000000.0}           # Time of hydration
+    ```
+
+    ```python
+    >>> inventory = FPDeviceInventory(FMC_object, cache_file='devices.json')
+    >>> for device in inventory.refresh().values():
+            print(device['record']['name'], device['zones'])
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    ttl: Maximum age of cached device details in seconds
+    cache_file: (optional) Path of JSON file to persist the cache
+    workers: Number of devices hydrated concurrently
+    """
+    DETAIL_TYPES = ['physicalinterfaces', 'subinterfaces']
+
+    def __init__(self, fmc, ttl=3600, cache_file=None, workers=4):
+        self.fmc = fmc
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.workers = workers
+        self.devices = {}  # Mapping of 'device_id': device entry
+        self.fetched = 0  # Time of last refresh
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file) as f:
+                cache = json.load(f)
+            self.devices = cache['devices']
+            self.fetched = cache['fetched']
+
+    def __iter__(self):
+        return iter(self.refresh().values())
+
+    @property
+    def names(self):
+        """
+        Mapping of 'device_name': 'device_id'
+        """
+        return dict((device['record']['name'], device_id) for device_id, device in self.devices.items())
+
+    def refresh(self, force=False):
+        """
+        Bring the cache up to date. Nothing is requested from FMC if the cache is younger than `ttl`.
+
+        # Parameters
+        force: Fetch everything again regardless of cache age
+
+        :return: Mapping of 'device_id': device entry
+        """
+        now = time()
+        if not force and self.devices and now - self.fetched < self.ttl:
+            return self.devices
+
+        records = dict((record['id'], record) for record in self.fmc.get_device_list())
+        policies = self._policy_assignments()
+        for device_id in set(self.devices) - set(records):
+            logger.info("Device {} is removed from FMC".format(self.devices[device_id]['record']['name']))
+            self.devices.pop(device_id)
+
+        stale = [
+            device_id for device_id in records
+            if force or device_id not in self.devices or now - self.devices[device_id]['fetched'] >= self.ttl]
+        logger.info("{}: Fetching details of {} out of {} devices".format(self.fmc.url, len(stale), len(records)))
+        for device_id, details in iter_parallel(self._hydrate, stale, workers=self.workers):
+            self.devices[device_id] = details
+
+        for device_id, record in records.items():
+            self.devices[device_id]['record'] = record
+            self.devices[device_id]['policies'] = policies.get(device_id, [])
+        self.fetched = now
+        self._save()
+        return self.devices
+
+    def _hydrate(self, device_id):
+        details = {'fetched': time()}
+        zones = set()
+        for detail_type in self.DETAIL_TYPES:
+            details[detail_type] = self.fmc.get_device_details(device_id, detail_type)
+            for intf in details[detail_type]:
+                if intf.get('securityZone'):
+                    zones.add(intf['securityZone']['name'])
+        details['zones'] = sorted(zones)
+        yield device_id, details
+
+    def _policy_assignments(self):
+        """
+        :return: Mapping of 'device_id': list of policies assigned to it
+        """
+        policies = {}
+        for assignment in self.fmc.get_all_resource_instances('assignment', 'policyassignments', limit=1000):
+            policy = assignment.get('policy', {})
+            for target in assignment.get('targets', []):
+                policies.setdefault(target['id'], []).append({
+                    'type': policy.get('type'), 'name': policy.get('name'), 'id': policy.get('id')})
+        return policies
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'fetched': self.fetched, 'devices': self.devices}, f)
+        os.rename(tmp_file, self.cache_file)
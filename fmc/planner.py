@@ -0,0 +1,252 @@
+import re
+import copy
+import math
+import itertools
+import threading
+import logging
+from time import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class FPRequestPlanner(object):
+    """
+    Count the requests an operation needs before running it. FMC allows 120 requests per minute, so number of requests
+    is what decides how long an import, migration or cleanup takes.
+
+    Within `dry_run`, POST, PUT and DELETE requests of the `FMC` object are not sent. They are counted and answered
+    with a made up response, e.g. the request data with a new 'id', so that the operation carries on as it would
+    against FMC. GET requests, e.g. table builds, are needed to plan the writes and are sent as usual, except reads of
+    made up objects and their task status, which are counted and answered locally. Object tables changed during the dry
+    run are restored afterwards.
+
+    ```python
+    >>> planner = FPRequestPlanner(FMC_object)
+    >>> with planner.dry_run():
+            import_objects(FMC_object, 'objects.csv')
+    >>> print(planner.summary())
+    table_build: 12, create: 2, bulk_create: 3, membership: 40, total: 57, ETA: 0:00:58
+    >>> with FPProgress(FMC_object, planner.total):
+            import_objects(FMC_object, 'objects.csv')
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    latency: Expected response time of FMC per request in seconds
+    """
+    CATEGORIES = ['table_build', 'read', 'create', 'bulk_create', 'update', 'membership', 'delete', 'deploy']
+    DRY_RUN_ID = 'dry-run-{:08d}'
+    DRY_RUN_PATTERN = re.compile(r'/(?P<id>dry-run-\d{8})(?:\?|$)')
+
+    def __init__(self, fmc, latency=0.5):
+        self.fmc = fmc
+        self.latency = latency
+        self.counts = OrderedDict((category, 0) for category in self.CATEGORIES)
+        self._fakes = {}  # Mapping of made up 'id': JSON
+        self._fake_ids = itertools.count(1)  # Never reused, even after fakes are deleted
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def category(self, url, method):
+        """
+        Category of a request, one of `CATEGORIES`.
+        """
+        path = url.split('?')[0].rstrip('/')
+        segments = path.split('/')
+        if method == 'GET':
+            # Collection URL ends with type, e.g. '.../object/hosts', instance URL ends with ID
+            return 'table_build' if segments[-1] in self._types() else 'read'
+        if method == 'POST':
+            if '/deployment/' in path:
+                return 'deploy'
+            return 'bulk_create' if 'bulk=true' in url else 'create'
+        if method == 'PUT':
+            return 'membership' if len(segments) > 1 and segments[-2] in self.fmc.GROUP_OBJECT_TYPES else 'update'
+        return 'delete'
+
+    def _types(self):
+        types = set()
+        for resource_types in self.fmc.RESOURCE_TREE.values():
+            types.update(resource_types)
+        types.update(['accessrules', 'physicalinterfaces', 'subinterfaces'])
+        return types
+
+    def count(self, url, method):
+        with self._lock:
+            self.counts[self.category(url, method)] += 1
+
+    def _fake_response(self, url, method, data):
+        path = url.split('?')[0].rstrip('/')
+        match = self.DRY_RUN_PATTERN.search(url)
+        with self._lock:
+            if method == 'GET':
+                if '/taskstatuses/' in path:
+                    return {'id': match.group('id'), 'status': 'Deployed'}
+                return copy.deepcopy(self._fakes.get(match.group('id'), ''))
+            if method == 'DELETE':
+                return (match and self._fakes.pop(match.group('id'), None)) or {'id': path.rsplit('/', 1)[-1]}
+            if method == 'PUT':
+                resp = copy.deepcopy(data)
+                if match:
+                    self._fakes[match.group('id')] = resp
+                return resp
+
+            def _created(item):
+                oid = self.DRY_RUN_ID.format(next(self._fake_ids))
+                obj_json = copy.deepcopy(item)
+                obj_json.update({'id': oid, 'links': {'self': path + '/' + oid}, 'metadata': {'task': {'id': oid}}})
+                if '/object/' in path:
+                    obj_json.setdefault('overridable', False)  # FMC default, expected by FPObject
+                self._fakes[oid] = obj_json
+                return obj_json
+            if isinstance(data, list):  # Bulk request
+                return {'items': [_created(item) for item in data]}
+            return _created(data or {})
+
+    @contextmanager
+    def dry_run(self):
+        """
+        Context manager that counts requests and keeps writes from being sent to FMC.
+        """
+        fmc = self.fmc
+        # Table object, names and names not found of each table
+        tables = dict((obj_type, (obj_table, OrderedDict(obj_table.names), dict(getattr(obj_table, '_missing', {}))))
+                      for obj_type, obj_table in fmc.obj_tables.items())
+        send = fmc._req
+
+        def _req(url, method='GET', data=None, **kwargs):
+            self.count(url, method)  # FMC gets all of them in a real run, e.g. task status polls of made up objects too
+            if method == 'GET' and not self.DRY_RUN_PATTERN.search(url):
+                return send(url, method=method, data=data, **kwargs)
+            logger.debug("Dry run: {} {}".format(method, url))
+            return self._fake_response(url, method, data)
+
+        fmc._req = _req
+        try:
+            yield self
+        finally:
+            del fmc._req
+            for obj_type in [obj_type for obj_type in fmc.obj_tables if obj_type not in tables]:
+                del fmc.obj_tables[obj_type]
+            for obj_type, (obj_table, names, missing) in tables.items():
+                obj_table.names = names
+                if hasattr(obj_table, '_missing'):
+                    obj_table._missing = missing
+                fmc.obj_tables[obj_type] = obj_table
+
+    def estimate(self, requests=None):
+        """
+        Wall clock time needed for `requests`, by default the counted ones, under the rate limit of the `FMC` object.
+
+        :return: Estimate in seconds
+        """
+        requests = self.total if requests is None else requests
+        limiter = self.fmc.rate_limiter
+        # Every full window costs its length plus the one second of slack added by the limiter
+        windows = max(0, int(math.ceil(float(requests) / limiter.max_requests)) - 1)
+        return max(windows * (limiter.period + 1), requests * self.latency)
+
+    def summary(self):
+        """
+        :return: One line report of counted requests and estimated time
+        """
+        counts = ['{}: {}'.format(category, count) for category, count in self.counts.items() if count]
+        return ', '.join(counts + ['total: {}'.format(self.total), 'ETA: {}'.format(_hms(self.estimate()))])
+
+
+class FPProgress(object):
+    """
+    Report progress and remaining time of an operation that is expected to send `total` requests, e.g. as counted by
+    `FPRequestPlanner`. Progress is taken from the request counter of the `FMC` rate limiter, and remaining time from
+    the throughput observed over the last rate limit period, so it accounts for FMC response times and rate limiting.
+    Progress is logged every `interval` seconds from a background thread, or passed to `callback`.
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    total: Expected number of requests
+    interval: Seconds between reports
+    callback: (optional) Function called with `FPProgress` instead of logging
+    """
+    def __init__(self, fmc, total, interval=10, callback=None):
+        self.fmc = fmc
+        self.total = total
+        self.interval = interval
+        self.callback = callback
+        self.start_count = None
+        self._samples = deque()  # (time, request count)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def done(self):
+        return self.fmc.rate_limiter.req_count - self.start_count
+
+    @property
+    def throughput(self):
+        """
+        Requests per second over the last rate limit period.
+        """
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, c0), (t1, c1) = self._samples[0], self._samples[-1]
+        return float(c1 - c0) / (t1 - t0) if t1 > t0 else 0.0
+
+    @property
+    def eta(self):
+        """
+        Estimated remaining time in seconds, `None` until throughput is known.
+        """
+        throughput = self.throughput
+        if not throughput:
+            return None
+        return max(0, self.total - self.done) / throughput
+
+    def sample(self):
+        now = time()
+        self._samples.append((now, self.fmc.rate_limiter.req_count))
+        while len(self._samples) > 2 and self._samples[0][0] < now - self.fmc.rate_limiter.period:
+            self._samples.popleft()
+
+    def report(self):
+        self.sample()
+        if self.callback is not None:
+            self.callback(self)
+            return
+        eta = self.eta
+        logger.info("{}: {} of {} requests ({:.0%}), {:.1f} req/s, ETA {}".format(
+            self.fmc.url, self.done, self.total, float(self.done) / max(self.total, 1), self.throughput,
+            _hms(eta) if eta is not None else 'unknown'))
+
+    def start(self):
+        self.start_count = self.fmc.rate_limiter.req_count
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name='FPProgress')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, errtype, errvalue, errtb):
+        self.stop()
+
+
+def _hms(seconds):
+    seconds = int(round(seconds))
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
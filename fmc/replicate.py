@@ -0,0 +1,150 @@
+import sys
+import threading
+import logging
+from Queue import Queue, Full
+from collections import OrderedDict
+from sync import nesting_levels, _child_type
+
+logger = logging.getLogger(__name__)
+
+_ITEM = 0
+_ERROR = 1
+_DONE = 2
+
+
+class FPObjectReplicator(object):
+    """
+    Copy policy objects from one FMC to another as a pipeline. A reader thread pages through the source FMC while the
+    calling thread creates objects in the target FMC, connected by a bounded queue. Each `FMC` object has its own rate
+    limiter, so the reader uses the budget of the source FMC at the same time as the writer uses the budget of the
+    target FMC, instead of the two alternating. When the writer falls behind, the full queue blocks the reader.
+
+    Types are copied in the given order; group types should follow the types of their members. Groups of one type are
+    sent in order of nesting level, so children exist before their parents. Objects are created with bulk requests of
+    up to `chunk_size` objects of one type and level. Objects whose name already exists in the target FMC are not
+    changed.
+
+    ```python
+    >>> replicator = FPObjectReplicator(fmc_old, fmc_new, ['hosts', 'networks', 'networkgroups'])
+    >>> replicator.run()
+    {'read': 12000, 'created': 11950, 'existing': 50, 'failed': 0}
+    ```
+
+    # Parameters
+    src: Source FMC server object `FMC` object
+    dst: Target FMC server object `FMC` object
+    types: Object types to copy
+    queue_size: Maximum number of objects read but not written yet
+    chunk_size: Maximum number of objects per bulk request
+    limit: Number of objects requested per page from source FMC
+    """
+    def __init__(self, src, dst, types, queue_size=5000, chunk_size=1000, limit=1000):
+        self.src = src
+        self.dst = dst
+        self.types = types
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.limit = limit
+        self.id_map = {}  # Mapping of source object 'id': target object 'id'
+        self.stats = dict((key, 0) for key in ['read', 'created', 'existing', 'failed'])
+
+    def _read(self, obj_type):
+        """
+        Generator function for objects of a type in source FMC as (level, object JSON), children first.
+        """
+        url = self.src.url + self.src.API_PATH['object'] + obj_type
+        items = self.src._iter_items(url, expanded=True, limit=self.limit)
+        if obj_type not in self.src.GROUP_OBJECT_TYPES:
+            for obj_json in items:
+                yield 0, obj_json
+            return
+        # Whole type is needed to order nested groups
+        objs = OrderedDict((obj_json['name'], obj_json) for obj_json in items)
+        levels = nesting_levels(obj_type, objs)
+        for name in sorted(objs, key=lambda name: levels[name]):
+            yield levels[name], objs[name]
+
+    def _reader(self, queue, stop):
+        def _put(entry):
+            # Keep checking 'stop' so that reader exits when writer fails
+            while not stop.is_set():
+                try:
+                    queue.put(entry, timeout=0.5)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        try:
+            for obj_type in self.types:
+                for level, obj_json in self._read(obj_type):
+                    if not _put((_ITEM, (obj_type, level, obj_json))):
+                        return
+            _put((_DONE, None))
+        except Exception:
+            _put((_ERROR, sys.exc_info()))
+
+    def _payload(self, obj_json):
+        data = dict((k, v) for k, v in obj_json.items() if k not in ['id', 'links', 'metadata'])
+        if 'objects' in data:
+            children = []
+            for ref in data['objects']:
+                child_id = self.id_map.get(ref['id']) or self.dst.obj_tables[_child_type(ref)].lookup(ref['name'])
+                if child_id is None:
+                    logger.error("{}: {} child {} not found in target FMC!".format(
+                        obj_json['name'], ref['type'], ref['name']))
+                    continue
+                children.append({'type': ref['type'], 'name': ref['name'], 'id': child_id})
+            data['objects'] = children
+        return data
+
+    def _write(self, obj_type, batch):
+        created = self.dst.bulk_create(
+            obj_type, [self._payload(obj_json) for obj_json in batch], chunk_size=self.chunk_size)
+        created_ids = dict((obj_json['name'], obj_json['id']) for obj_json in created)
+        for obj_json in batch:
+            if obj_json['name'] in created_ids:
+                self.id_map[obj_json['id']] = created_ids[obj_json['name']]
+        self.stats['created'] += len(created_ids)
+        self.stats['failed'] += len(batch) - len(created_ids)
+
+    def run(self):
+        """
+        Copy the objects.
+
+        :return: Replication statistics
+        """
+        queue = Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        reader = threading.Thread(target=self._reader, args=(queue, stop), name='FPObjectReplicator')
+        reader.daemon = True
+        reader.start()
+        try:
+            # Target tables are built while the reader is already busy
+            for obj_type in self.types:
+                self.dst.obj_tables[obj_type].build()
+            batch = []
+            batch_key = None
+            while True:
+                kind, value = queue.get()
+                if kind == _ERROR:
+                    raise value[0], value[1], value[2]
+                if kind == _ITEM:
+                    obj_type, level, obj_json = value
+                    self.stats['read'] += 1
+                    dst_id = self.dst.obj_tables[obj_type].names.get(obj_json['name'])
+                    if dst_id is not None:
+                        self.id_map[obj_json['id']] = dst_id
+                        self.stats['existing'] += 1
+                        continue
+                if batch and (kind == _DONE or (obj_type, level) != batch_key or len(batch) >= self.chunk_size):
+                    self._write(batch_key[0], batch)
+                    batch = []
+                if kind == _DONE:
+                    break
+                batch_key = (obj_type, level)
+                batch.append(obj_json)
+        finally:
+            stop.set()
+        logger.info("{} -> {}: Replication: {}".format(self.src.url, self.dst.url, self.stats))
+        return self.stats
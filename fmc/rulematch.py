@@ -0,0 +1,340 @@
+import logging
+from netaddr import IPNetwork, IPRange, AddrFormatError
+from rest.intervals import (
+    IPV6_OFFSET, IP_ANY, PORT_ANY, PROTOCOLS, IntervalIndex, merge_intervals, ip_to_int, protocol_number, contains)
+
+logger = logging.getLogger(__name__)
+
+# Protocol of ICMP objects, which have no 'protocol' attribute
+ICMP_OBJECT_PROTOCOLS = {'ICMPV4OBJECT': 1, 'ICMPV6OBJECT': 58}
+# Rule conditions that cannot be evaluated for a flow using addresses, ports and zones only
+CONDITION_FIELDS = [
+    'applications', 'urls', 'users', 'vlanTags', 'sourceSecurityGroupTags', 'sourceDynamicObjects']
+
+
+class SetIndex(object):
+    """
+    Index of discrete values per rule, e.g. security zone names. `None` stands for any value.
+    """
+    def __init__(self):
+        self.any = 0
+        self.values = {}
+
+    def add(self, bit, values):
+        flag = 1 << bit
+        if values is None:
+            self.any |= flag
+            return
+        for value in values:
+            self.values[value] = self.values.get(value, 0) | flag
+
+    def build(self):
+        pass
+
+    def lookup(self, value):
+        return self.any | self.values.get(value, 0)
+
+
+class FPObjectResolver(object):
+    """
+    Resolve network and port objects, including nested groups, to merged integer intervals without talking to FMC.
+
+    Objects are added from their JSON definition, e.g. items of `FPObjectTable` iteration. `from_fmc` loads all the
+    object types that can be children of network and port groups as per `FMC.CHILD_OBJECT_TYPES`.
+
+    References that cannot be resolved are recorded in `unresolved` and treated as 'any' by `FPRuleIndex`.
+    """
+    def __init__(self, objects=None):
+        self.objects = {}  # Mapping of 'id': object JSON
+        self.unresolved = set()
+        self._cache = {}
+        for obj_json in objects or []:
+            self.add(obj_json)
+
+    @classmethod
+    def from_fmc(cls, fmc):
+        resolver = cls()
+        for group_type in ['networkgroups', 'portobjectgroups']:
+            for obj_type in fmc.CHILD_OBJECT_TYPES[group_type]:
+                for fp_obj in fmc.obj_tables[obj_type]:
+                    resolver.add(fp_obj.json)
+        return resolver
+
+    def add(self, obj_json):
+        self.objects[obj_json['id']] = obj_json
+        self._cache.clear()
+
+    def _resolve(self, ref, convert, resolving):
+        """
+        Resolve object reference or literal to list of intervals. Returns `None` when it cannot be resolved.
+        """
+        oid = ref.get('id')
+        if oid is None:  # Literal
+            return convert(ref)
+        if oid in self._cache:
+            return self._cache[oid]
+        obj_json = self.objects.get(oid)
+        if obj_json is None or oid in resolving:
+            self.unresolved.add(oid)
+            return None
+        resolving.add(oid)
+        if 'objects' in obj_json or 'literals' in obj_json:  # Group
+            intervals = []
+            for child in obj_json.get('objects', []) + obj_json.get('literals', []):
+                child_intervals = self._resolve(child, convert, resolving)
+                if child_intervals is None:
+                    intervals = None
+                    break
+                intervals.extend(child_intervals)
+        else:
+            intervals = convert(obj_json)
+        resolving.discard(oid)
+        if intervals is not None:
+            intervals = merge_intervals(intervals)
+        self._cache[oid] = intervals
+        return intervals
+
+    def _resolve_all(self, field, convert, default):
+        """
+        Resolve 'sourceNetworks' like rule field having 'objects' and 'literals'.
+        """
+        if not field:
+            return [default]
+        intervals = []
+        for ref in field.get('objects', []) + field.get('literals', []):
+            ref_intervals = self._resolve(ref, convert, set())
+            if ref_intervals is None:
+                return None
+            intervals.extend(ref_intervals)
+        return merge_intervals(intervals)
+
+    def networks(self, field):
+        return self._resolve_all(field, self._network_intervals, IP_ANY)
+
+    def ports(self, field):
+        return self._resolve_all(field, self._port_intervals, PORT_ANY)
+
+    @staticmethod
+    def _network_intervals(obj_json):
+        value = obj_json.get('value')
+        try:
+            if obj_json['type'] == 'Range':
+                ip_range = IPRange(*value.split('-'))
+                first, last, version = ip_range.first, ip_range.last, ip_range.version
+            else:  # Host, Network
+                ip_nw = IPNetwork(value)
+                first, last, version = ip_nw.first, ip_nw.last, ip_nw.version
+        except (AddrFormatError, AttributeError, TypeError, ValueError):
+            return None
+        if version == 6:
+            return [(IPV6_OFFSET + first, IPV6_OFFSET + last)]
+        return [(first, last)]
+
+    @staticmethod
+    def _port_intervals(obj_json):
+        if obj_json.get('type') == 'AnyProtocolPortObject':
+            return [PORT_ANY]
+        try:
+            protocol = protocol_number(obj_json['protocol'])
+        except KeyError:
+            protocol = ICMP_OBJECT_PROTOCOLS.get(str(obj_json.get('type', '')).upper())
+            if protocol is None:
+                return None
+        port = str(obj_json.get('port', obj_json.get('icmpType')) or '').strip()
+        base = protocol << 16
+        if not port[:1].isdigit():  # All ports or ICMP types of the protocol
+            return [(base, base + 0xffff)]
+        lo, _, hi = port.partition('-')
+        return [(base + int(lo), base + int(hi or lo))]
+
+
+class FPRuleIndex(object):
+    """
+    Compiled match index for access rules of one access policy. It answers which rules match a flow and which rules
+    are shadowed by earlier rules, locally and without FMC API requests.
+
+    Rules are flattened into merged intervals per dimension (source/destination address, source/destination port)
+    and zone sets. Dimensions are indexed with `IntervalIndex` and `SetIndex` in blocks of `BLOCK_SIZE` rules, so a
+    lookup is one `bisect` per dimension and block followed by intersection of bitmasks, while bitmasks stay small
+    for policies with tens of thousands of rules.
+
+    Disabled rules are skipped unless `include_disabled` is set. Rules with conditions that cannot be evaluated for a
+    flow, e.g. applications or users, or with unresolved objects are marked as conditional: they are reported by
+    `match` but never as a definite first match or as shadowing another rule.
+
+    ```python
+    >>> resolver = FPObjectResolver.from_fmc(FMC_object)
+    >>> index = FPRuleIndex(FMC_object.get_access_rules(policy_id), resolver)
+    >>> index.first_match(src='10.1.2.3', dst='172.16.0.5', protocol='TCP', dport=443)
+    ```
+
+    # Parameters
+    rules: Access rule JSON in rule order, e.g. from `FMC.get_access_rules`
+    resolver: `FPObjectResolver` with all referenced network and port objects
+    include_disabled: Index disabled rules as well
+    """
+    BLOCK_SIZE = 4096
+    DIMENSIONS = ['src', 'dst', 'sport', 'dport', 'src_zone', 'dst_zone']
+
+    def __init__(self, rules, resolver, include_disabled=False):
+        self.rules = []  # Rule JSON in rule order
+        self.flat = []  # Flattened rules: dimension name -> merged intervals or zone set
+        self._blocks = []  # dimension name -> IntervalIndex / SetIndex, one per block
+        self._conditional = []  # Bitmask of conditional rules, one per block
+        for rule_json in rules:
+            if rule_json.get('enabled', True) or include_disabled:
+                self._add_rule(rule_json, resolver)
+        for block in self._blocks:
+            for dim_index in block.values():
+                dim_index.build()
+        logger.info("Indexed {} access rules in {} blocks".format(len(self.rules), len(self._blocks)))
+
+    @classmethod
+    def from_fmc(cls, fmc, policy_id, resolver=None, include_disabled=False):
+        if resolver is None:
+            resolver = FPObjectResolver.from_fmc(fmc)
+        return cls(fmc.get_access_rules(policy_id), resolver, include_disabled=include_disabled)
+
+    def _add_rule(self, rule_json, resolver):
+        conditional = any(rule_json.get(field) for field in CONDITION_FIELDS)
+        flat = {
+            'src': resolver.networks(rule_json.get('sourceNetworks')),
+            'dst': resolver.networks(rule_json.get('destinationNetworks')),
+            'sport': resolver.ports(rule_json.get('sourcePorts')),
+            'dport': resolver.ports(rule_json.get('destinationPorts')),
+            'src_zone': self._zones(rule_json.get('sourceZones')),
+            'dst_zone': self._zones(rule_json.get('destinationZones'))}
+        for dim in ['src', 'dst']:
+            if flat[dim] is None:
+                logger.warning("Rule {}: unresolved {} networks".format(rule_json.get('name'), dim))
+                flat[dim] = [IP_ANY]
+                conditional = True
+        for dim in ['sport', 'dport']:
+            if flat[dim] is None:
+                logger.warning("Rule {}: unresolved {} ports".format(rule_json.get('name'), dim))
+                flat[dim] = [PORT_ANY]
+                conditional = True
+
+        rule_index = len(self.rules)
+        bit = rule_index % self.BLOCK_SIZE
+        if bit == 0:
+            self._blocks.append({
+                'src': IntervalIndex(), 'dst': IntervalIndex(),
+                'sport': IntervalIndex(), 'dport': IntervalIndex(),
+                'src_zone': SetIndex(), 'dst_zone': SetIndex()})
+            self._conditional.append(0)
+        for dim, dim_index in self._blocks[-1].items():
+            dim_index.add(bit, flat[dim])
+        if conditional:
+            self._conditional[-1] |= 1 << bit
+        self.rules.append(rule_json)
+        self.flat.append(flat)
+
+    @staticmethod
+    def _zones(field):
+        if not field or not field.get('objects'):
+            return None
+        return frozenset(zone['name'] for zone in field['objects'])
+
+    def is_conditional(self, rule_index):
+        block, bit = divmod(rule_index, self.BLOCK_SIZE)
+        return bool(self._conditional[block] >> bit & 1)
+
+    @staticmethod
+    def _port_query(protocol, port):
+        """
+        Port dimension query, exact point or whole protocol range if port is not known.
+        """
+        base = protocol << 16
+        if port is None:
+            return base, base + 0xffff
+        return base + int(port), None
+
+    def _iter_matches(self, query):
+        for block_num, block in enumerate(self._blocks):
+            base = block_num * self.BLOCK_SIZE
+            mask = (1 << min(self.BLOCK_SIZE, len(self.rules) - base)) - 1
+            for dim, (lo, hi) in query:
+                if hi is None:
+                    mask &= block[dim].lookup(lo)
+                else:
+                    mask &= block[dim].lookup_range(lo, hi)
+                if not mask:
+                    break
+            while mask:
+                low_bit = mask & -mask
+                yield base + low_bit.bit_length() - 1
+                mask ^= low_bit
+
+    def match(self, src=None, dst=None, protocol=None, dport=None, sport=None, src_zone=None, dst_zone=None):
+        """
+        Generator of indexes into `rules` of all the rules matching a flow, in rule order. Omitted flow attributes
+        match any rule. Ports are only considered if `protocol` is provided, omitted port then matches any port of
+        that protocol.
+
+        # Parameters
+        src: Source IP address
+        dst: Destination IP address
+        protocol: Protocol name or number, e.g. 'TCP' or 6
+        dport: Destination port or ICMP type
+        sport: Source port
+        src_zone: Source security zone name
+        dst_zone: Destination security zone name
+        """
+        query = []
+        if src is not None:
+            query.append(('src', (ip_to_int(src), None)))
+        if dst is not None:
+            query.append(('dst', (ip_to_int(dst), None)))
+        if protocol is not None:
+            protocol = protocol_number(protocol)
+            query.append(('dport', self._port_query(protocol, dport)))
+            query.append(('sport', self._port_query(protocol, sport)))
+        if src_zone is not None:
+            query.append(('src_zone', (src_zone, None)))
+        if dst_zone is not None:
+            query.append(('dst_zone', (dst_zone, None)))
+        return self._iter_matches(query)
+
+    def first_match(self, *args, **kwargs):
+        """
+        Return index of the first rule that definitely matches a flow, or `None`. Parameters are same as `match`.
+        """
+        for rule_index in self.match(*args, **kwargs):
+            if not self.is_conditional(rule_index):
+                return rule_index
+
+    def _covers(self, outer, inner):
+        for dim in ['src', 'dst', 'sport', 'dport']:
+            if not contains(outer[dim], inner[dim]):
+                return False
+        for dim in ['src_zone', 'dst_zone']:
+            if outer[dim] is not None and (inner[dim] is None or not inner[dim] <= outer[dim]):
+                return False
+        return True
+
+    def shadowing_rule(self, rule_index):
+        """
+        Return index of the first earlier rule whose match space contains the whole match space of the rule at
+        `rule_index`, or `None`. Conditional rules never shadow other rules.
+        """
+        flat = self.flat[rule_index]
+        # Every shadowing rule must match the lowest point of each dimension
+        query = [(dim, (flat[dim][0][0], None)) for dim in ['src', 'dst', 'sport', 'dport']]
+        for dim in ['src_zone', 'dst_zone']:
+            if flat[dim] is not None:
+                query.append((dim, (next(iter(flat[dim])), None)))
+        for candidate in self._iter_matches(query):
+            if candidate >= rule_index:
+                return None
+            if not self.is_conditional(candidate) and self._covers(self.flat[candidate], flat):
+                return candidate
+
+    def shadowed(self):
+        """
+        Generator of `(rule_index, shadowing_rule_index)` tuples for all shadowed rules.
+        """
+        for rule_index in xrange(len(self.rules)):
+            shadowing = self.shadowing_rule(rule_index)
+            if shadowing is not None:
+                yield rule_index, shadowing
@@ -0,0 +1,239 @@
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _child_type(ref):
+    # Host -> hosts, Range -> ranges, Url -> urls
+    return ref['type'].lower() + 's'
+
+
+def nesting_levels(obj_type, objs):
+    """
+    Nesting level of each object of a group type: 0 if it contains no groups of same type, 1 if it contains groups
+    of level 0, etc. Creating objects in order of their level creates children before parents.
+
+    # Parameters
+    obj_type: Object type, e.g. 'networkgroups'
+    objs: Mapping of 'name': object JSON
+
+    :return: Mapping of 'name': level
+    """
+    ids = dict((obj_json['id'], obj_json) for obj_json in objs.values())
+
+    def _nested(group_json):
+        return [
+            ids[ref['id']] for ref in group_json.get('objects', [])
+            if _child_type(ref) == obj_type and ref['id'] in ids]
+
+    levels = {}
+    for obj_json in objs.values():
+        stack = [(obj_json, False)]
+        visiting = set()  # Guard against cycles, FMC does not allow them anyway
+        while stack:
+            current, children_done = stack.pop()
+            if children_done:
+                levels[current['id']] = 1 + max([levels.get(ch['id'], 0) for ch in _nested(current)] or [-1])
+                visiting.discard(current['id'])
+            elif current['id'] not in levels and current['id'] not in visiting:
+                visiting.add(current['id'])
+                stack.append((current, True))
+                stack.extend((ch, False) for ch in _nested(current))
+    return dict((name, levels[obj_json['id']]) for name, obj_json in objs.items())
+
+
+class FPObjectSync(object):
+    """
+    Synchronize policy objects from one FMC to another with a minimal number of requests.
+
+    `load` downloads both object stores with one request per 1000 objects. `diff` matches objects of each type by name
+    and then by content hash, so renamed objects are renamed instead of created again, and builds an ordered plan:
+
+    1. creates, children before parents, bulk POSTs per type and nesting level
+    2. updates, i.e. changed or renamed objects
+    3. deletes of objects missing in source FMC, parents before children
+
+    Each plan entry is a `dict` with 'op', 'type', 'name' and JSON of source ('src') and target ('dst') objects. Read
+    only objects, e.g. system defined objects, are never updated or deleted.
+
+    ```python
+    >>> sync = FPObjectSync(fmc_old, fmc_new, ['hosts', 'networks', 'networkgroups'])
+    >>> for op in sync.diff():
+            print(op['op'], op['type'], op['name'])
+    >>> sync.execute()
+    ```
+
+    # Parameters
+    src: Source FMC server object `FMC` object
+    dst: Target FMC server object `FMC` object
+    types: Object types to synchronize
+    delete: Delete objects of target FMC that are missing in source FMC
+    """
+    IGNORED_KEYS = ['id', 'links', 'metadata', 'name']
+
+    def __init__(self, src, dst, types, delete=False):
+        self.src = src
+        self.dst = dst
+        # Children types must be created before group types
+        self.types = (
+            [t for t in types if t not in src.GROUP_OBJECT_TYPES] + [t for t in types if t in src.GROUP_OBJECT_TYPES])
+        self.delete = delete
+        self.src_objs = None
+        self.dst_objs = None
+        self.id_map = {}  # Mapping of source object 'id': target object 'id'
+        self.plan = []
+
+    @staticmethod
+    def _read_only(obj_json):
+        read_only = obj_json.get('metadata', {}).get('readOnly')
+        return bool(read_only and read_only.get('state'))
+
+    def _load(self, fmc):
+        objs = {}
+        for obj_type in self.types:
+            url = fmc.url + fmc.API_PATH['object'] + obj_type
+            objs[obj_type] = OrderedDict(
+                (obj_json['name'], obj_json) for obj_json in fmc._iter_items(url, expanded=True, limit=1000))
+            logger.info("{}: Loaded {} {} objects".format(fmc.url, len(objs[obj_type]), obj_type))
+        return objs
+
+    def load(self):
+        self.src_objs = self._load(self.src)
+        self.dst_objs = self._load(self.dst)
+
+    def content_hash(self, obj_json):
+        """
+        Hash of object definition without name and FMC specific attributes. Children are identified by type and name.
+        """
+        content = dict((k, v) for k, v in obj_json.items() if k not in self.IGNORED_KEYS)
+        if 'objects' in content:
+            content['objects'] = sorted([ref['type'], ref['name']] for ref in content['objects'])
+        if 'literals' in content:
+            content['literals'] = sorted(json.dumps(lit, sort_keys=True) for lit in content['literals'])
+        return hashlib.sha1(json.dumps(content, sort_keys=True)).hexdigest()
+
+    def diff(self):
+        """
+        Compute the plan.
+
+        :return: List of plan entries
+        """
+        if self.src_objs is None:
+            self.load()
+        creates, updates, deletes = [], [], []
+        for type_index, obj_type in enumerate(self.types):
+            src_objs = self.src_objs[obj_type]
+            dst_objs = self.dst_objs[obj_type]
+            src_levels = nesting_levels(obj_type, src_objs)
+            dst_levels = nesting_levels(obj_type, dst_objs)
+
+            src_hashes = dict((name, self.content_hash(obj_json)) for name, obj_json in src_objs.items())
+            # Objects with same name
+            unmatched_src = []
+            for name, src_json in src_objs.items():
+                dst_json = dst_objs.get(name)
+                if dst_json is None:
+                    unmatched_src.append(name)
+                    continue
+                self.id_map[src_json['id']] = dst_json['id']
+                if src_hashes[name] != self.content_hash(dst_json) and not self._read_only(dst_json):
+                    updates.append({'op': 'update', 'type': obj_type, 'name': name, 'src': src_json, 'dst': dst_json})
+            # Renamed objects with same content
+            unmatched_dst = OrderedDict()
+            for name, dst_json in dst_objs.items():
+                if name not in src_objs and not self._read_only(dst_json):
+                    unmatched_dst.setdefault(self.content_hash(dst_json), []).append(dst_json)
+            for name in unmatched_src:
+                src_json = src_objs[name]
+                candidates = unmatched_dst.get(src_hashes[name])
+                if candidates:
+                    dst_json = candidates.pop(0)
+                    self.id_map[src_json['id']] = dst_json['id']
+                    updates.append({'op': 'rename', 'type': obj_type, 'name': name, 'src': src_json, 'dst': dst_json})
+                else:
+                    creates.append({'op': 'create', 'type': obj_type, 'name': name, 'src': src_json, 'dst': None,
+                                    'order': (type_index, src_levels[name])})
+            if self.delete:
+                for candidates in unmatched_dst.values():
+                    for dst_json in candidates:
+                        deletes.append({
+                            'op': 'delete', 'type': obj_type, 'name': dst_json['name'], 'src': None, 'dst': dst_json,
+                            'order': (type_index, dst_levels[dst_json['name']])})
+
+        creates.sort(key=lambda op: op['order'])
+        deletes.sort(key=lambda op: op['order'], reverse=True)
+        self.plan = creates + updates + deletes
+        return self.plan
+
+    def summary(self):
+        """
+        :return: Number of planned operations per operation type
+        """
+        counts = dict((op, 0) for op in ['create', 'update', 'rename', 'delete'])
+        for op in self.plan:
+            counts[op['op']] += 1
+        return counts
+
+    def _dst_id(self, ref):
+        """
+        Target FMC ID of a child object referred by source FMC object.
+
+        :return: ID or `None` if the child is not found in target FMC
+        """
+        if ref['id'] in self.id_map:
+            return self.id_map[ref['id']]
+        # Child type is not synchronized, look it up by name
+        return self.dst.obj_tables[_child_type(ref)].lookup(ref['name'])
+
+    def _payload(self, src_json, dst_id=None):
+        data = dict((k, v) for k, v in src_json.items() if k not in ['id', 'links', 'metadata'])
+        if 'objects' in data:
+            children = []
+            for ref in data['objects']:
+                child_id = self._dst_id(ref)
+                if child_id is None:
+                    logger.error("{}: {} child {} not found in target FMC!".format(
+                        src_json['name'], ref['type'], ref['name']))
+                    continue
+                children.append({'type': ref['type'], 'name': ref['name'], 'id': child_id})
+            data['objects'] = children
+        if dst_id is not None:
+            data['id'] = dst_id
+        return data
+
+    def execute(self, chunk_size=1000):
+        """
+        Execute the plan on target FMC. Consecutive creates of same type and nesting level are sent as bulk requests.
+        """
+        if not self.plan:
+            self.diff()
+        batch = []
+        for op in self.plan + [None]:
+            if batch and (op is None or op['op'] != 'create' or op['order'] != batch[0]['order']):
+                created = self.dst.bulk_create(
+                    batch[0]['type'], [self._payload(b['src']) for b in batch], chunk_size=chunk_size)
+                created_ids = dict((obj_json['name'], obj_json['id']) for obj_json in created)
+                for b in batch:
+                    if b['name'] in created_ids:
+                        self.id_map[b['src']['id']] = created_ids[b['name']]
+                batch = []
+            if op is None:
+                break
+            if op['op'] == 'create':
+                batch.append(op)
+            elif op['op'] in ['update', 'rename']:
+                logging.warning("Updating {} object {}!".format(op['type'], op['dst']['name']))
+                resp = self.dst._req(
+                    op['dst']['links']['self'], method='PUT', data=self._payload(op['src'], op['dst']['id']))
+                if len(resp):
+                    obj_names = self.dst.obj_tables[op['type']].names
+                    obj_names.pop(op['dst']['name'], None)
+                    obj_names[resp['name']] = resp['id']
+            elif op['op'] == 'delete':
+                logging.warning("Deleting {} object: {}!".format(op['type'], op['name']))
+                resp = self.dst._req(op['dst']['links']['self'], method='DELETE')
+                if len(resp):
+                    self.dst.obj_tables[op['type']].names.pop(op['name'], None)
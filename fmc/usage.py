@@ -0,0 +1,134 @@
+import logging
+from rest import iter_parallel
+
+logger = logging.getLogger(__name__)
+
+
+class FPObjectUsage(object):
+    """
+    Index of policy object references in FMC, to find objects that are not used anywhere.
+
+    `scan` pulls objects with group memberships, access rules of all access policies and NAT rules of all FTD NAT
+    policies concurrently, one request per 1000 items, and builds a mapping of object ID to its referrers. Referrers
+    are `(type, id, name)` tuples, e.g. `('networkgroups', group_id, group_name)` or `('accessrules', rule_id,
+    rule_name)`.
+
+    Only references in the scanned sources are known. Objects used elsewhere, e.g. in prefilter policies or platform
+    settings, are reported as unused and FMC refuses to delete them.
+
+    ```python
+    >>> usage = FPObjectUsage(FMC_object, types=FMC_object.NETWORK_OBJECT_TYPES)
+    >>> usage.scan()
+    >>> for obj_type, obj_json in usage.unused():
+            print(obj_type, obj_json['name'])
+    ```
+
+    # Parameters
+    fmc: FMC server object `FMC` object.
+    types: (optional) Object types to report on, network, port, URL and VLAN objects by default
+    workers: Number of sources fetched concurrently
+    limit: Number of items requested per page
+    """
+    def __init__(self, fmc, types=None, workers=4, limit=1000):
+        self.fmc = fmc
+        self.types = types or (
+            fmc.NETWORK_OBJECT_TYPES + fmc.PORT_OBJECT_TYPES + fmc.URL_OBJECT_TYPES + fmc.VLAN_OBJECT_TYPES)
+        self.workers = workers
+        self.limit = limit
+        self.objects = {}  # Mapping of 'id': ('type', object JSON) of scanned objects
+        self.referrers = {}  # Mapping of 'id': set of referrers
+
+    def _sources(self):
+        sources = [('object', obj_type) for obj_type in self.types]
+        for rule_type, policy_type in [('accessrules', 'accesspolicies'), ('natrules', 'ftdnatpolicies')]:
+            for policy in self.fmc.get_all_resource_instances('policy', policy_type, limit=self.limit):
+                sources.append((rule_type, policy['id']))
+        return sources
+
+    def _fetch(self, source):
+        kind, key = source
+        if kind == 'object':
+            items = self.fmc._iter_items(self.fmc.url + self.fmc.API_PATH['object'] + key, limit=self.limit)
+        elif kind == 'accessrules':
+            items = self.fmc.get_access_rules(key, limit=self.limit)
+        else:
+            items = self.fmc.get_nat_rules(key, limit=self.limit)
+        for item in items:
+            yield kind, key, item
+
+    @staticmethod
+    def _references(value):
+        """
+        Generator function for IDs of everything referred within JSON of a rule, e.g. 'sourceNetworks' of access rules
+        or 'originalSource' of NAT rules.
+        """
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                if 'id' in value and 'type' in value:
+                    yield value['id']
+                stack.extend(v for k, v in value.items() if k not in ['links', 'metadata'])
+            elif isinstance(value, list):
+                stack.extend(value)
+
+    def _add_referrer(self, oid, referrer):
+        self.referrers.setdefault(oid, set()).add(referrer)
+
+    def scan(self):
+        """
+        Fetch all the sources and build the referrers index.
+
+        :return: Number of referenced objects
+        """
+        self.objects = {}
+        self.referrers = {}
+        for kind, key, item in iter_parallel(self._fetch, self._sources(), workers=self.workers):
+            if kind == 'object':
+                self.objects[item['id']] = (key, item)
+                for ref in item.get('objects', []):  # Group members
+                    self._add_referrer(ref['id'], (key, item['id'], item.get('name')))
+            else:
+                referrer = (kind, item['id'], item.get('name'))
+                for oid in self._references(dict((k, v) for k, v in item.items() if k not in ['id', 'type'])):
+                    self._add_referrer(oid, referrer)
+        logger.info("{}: Scanned {} objects, {} objects are referenced".format(
+            self.fmc.url, len(self.objects), len(self.referrers)))
+        return len(self.referrers)
+
+    @staticmethod
+    def _read_only(obj_json):
+        read_only = obj_json.get('metadata', {}).get('readOnly')
+        return bool(read_only and read_only.get('state'))
+
+    def unused(self, cascade=True):
+        """
+        Objects that are not referenced, in the order they can be deleted, i.e. groups before their members. With
+        `cascade`, members that are referenced only by unused groups are included as well. System defined, i.e. read
+        only, objects are never included.
+
+        :return: List of ('type', object JSON)
+        """
+        if not self.objects:
+            self.scan()
+        removed = set()
+        ordered = []
+        candidates = [oid for oid, (obj_type, obj_json) in self.objects.items() if not self._read_only(obj_json)]
+        while candidates:
+            level = [
+                oid for oid in candidates
+                if all(referrer[1] in removed for referrer in self.referrers.get(oid, ()))]
+            if not level:
+                break
+            removed.update(level)
+            ordered.extend(sorted((self.objects[oid] for oid in level), key=lambda obj: (obj[0], obj[1]['name'])))
+            if not cascade:
+                break
+            candidates = [oid for oid in candidates if oid not in removed]
+        return ordered
+
+    def referrers_of(self, oid):
+        """
+        :return: Set of referrers of the object
+        """
+        return self.referrers.get(oid, set())
@@ -7,7 +7,7 @@ logger = logging.getLogger(__name__)
 
 def main():
     """
-    Delete all non-default network objects from FMC. This is useful for API testing.
+    Delete all non-default network and port objects that are not used from FMC. This is useful for API testing.
     """
     logging.basicConfig(
         # filename='/path/to/python-fmc/output.txt',
@@ -62,20 +62,18 @@ def main():
     DEFAULT_OBJECTS['icmpv6objects'] = []
 
     with fmc.FMC(url=server_url, username=username, password=password) as lab_fmc:
-        # Build the object names dictionary for the FMC
-        for obj_type in [
+        # One scan of objects, group memberships, access rules and NAT rules tells which objects are not used
+        usage = fmc.FPObjectUsage(lab_fmc, types=[
                 'networkgroups', 'hosts', 'networks', 'ranges',
-                'portobjectgroups', 'protocolportobjects', 'icmpv6objects'
-        ]:  # Groups first order
-            lab_fmc.obj_tables[obj_type].build()  # List of objects with child first order
-            names_dict = lab_fmc.obj_tables[obj_type].names
-            for obj_name, obj_id in names_dict.items()[::-1]:  # Delete with parents first order
-                if obj_name in DEFAULT_OBJECTS[obj_type]:
-                    continue
-                else:
-                    # obj_id = names_dict[obj_name]
-                    fp_obj = fmc.FPObject(lab_fmc, type=obj_type, oid=obj_id)
-                    fp_obj.delete()
+                'portobjectgroups', 'protocolportobjects', 'icmpv4objects', 'icmpv6objects'
+        ])
+        usage.scan()
+        for obj_type, obj_json in usage.unused():  # Delete with parents first order
+            if obj_json['name'] in DEFAULT_OBJECTS[obj_type]:
+                continue
+            else:
+                fp_obj = fmc.FPObject(lab_fmc, type=obj_type, json=obj_json)
+                fp_obj.delete()
 
     # End of with block
     print("Done running...")
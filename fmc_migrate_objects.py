@@ -47,17 +47,9 @@ def main():
 
     with fmc.FMC(url=server_from, username=username, password=password) as fmc_old:
         with fmc.FMC(url=server_to, username=username, password=password) as fmc_new:
-            for obj_type in obj_types:
-                # Build the names dictionary for new FMC
-                fmc_old.obj_tables[obj_type].build()  # child first order
-                fmc_new.obj_tables[obj_type].build()  # child first order
-                names_dict = fmc_old.obj_tables[obj_type].names
-                # Migrate objects from old FMC VM to new FMC VM
-                for obj_name, obj_id in names_dict.items():
-                    print "{}: old_id {}".format(obj_name, obj_id)
-                    obj_old = fmc.FPObject(fmc_old, type=obj_type, oid=obj_id)
-                    obj_new = fmc.FPObject(fmc_new, obj=obj_old)
-                    print "{}: new_id {}".format(obj_new.name, obj_new.id)
+            # Reading from old FMC and writing to new FMC run concurrently, each within its own rate limit
+            replicator = fmc.FPObjectReplicator(fmc_old, fmc_new, obj_types)
+            print replicator.run()
 
     # End of with block
     print("Done running...")
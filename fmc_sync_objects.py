@@ -0,0 +1,59 @@
+import fmc  # Firepower Management Center (FMC) 6.1 API
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """
+    Synchronize policy objects from one FMC to another. Only the difference is created, updated or deleted.
+    """
+    logging.basicConfig(
+        # filename='/path/to/python-fmc/output.txt',
+        stream=sys.stderr,
+        level=logging.INFO,  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+        # format="[%(levelname)8s]:  %(message)s",
+        format='[%(asctime)s-%(levelname)s]: %(message)s',
+        datefmt='%m/%d/%Y %I:%M:%S %p')
+
+    # Get server, username and password from CLI
+    username = 'username'
+    if len(sys.argv) > 1:
+        username = sys.argv[1]
+    password = 'password'
+    if len(sys.argv) > 2:
+        password = sys.argv[2]
+    server_from = 'https://fmc1.example.com'
+    if len(sys.argv) > 3:
+        server_from = sys.argv[3]
+    server_to = 'https://fmc2.example.com'
+    if len(sys.argv) > 4:
+        server_to = sys.argv[4]
+    dry_run = '--dry-run' in sys.argv
+
+    obj_types = [
+        'hosts', 'networks', 'ranges',  # Network
+        'networkgroups',                # Network
+        'vlantags', 'vlangrouptags',    # VLAN Tag
+        'urls', 'urlgroups',            # URL
+        'protocolportobjects',          # Service
+        'icmpv6objects',                # Service
+        'portobjectgroups',             # Service
+        ]
+
+    with fmc.FMC(url=server_from, username=username, password=password) as fmc_old:
+        with fmc.FMC(url=server_to, username=username, password=password) as fmc_new:
+            sync = fmc.FPObjectSync(fmc_old, fmc_new, obj_types, delete=True)
+            for op in sync.diff():
+                print "{} {} {}".format(op['op'], op['type'], op['name'])
+            print sync.summary()
+            if not dry_run:
+                sync.execute()
+
+    # End of with block
+    print("Done running...")
+
+# Standard boilerplate to call main() function.
+if __name__ == "__main__":
+    main()
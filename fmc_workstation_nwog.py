@@ -1,7 +1,6 @@
 import fmc  # Firepower Management Center (FMC) 6.1 API
 import sys
 import logging
-import csv
 # from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
@@ -37,21 +36,6 @@ def main():
     # "10.48.0.0/20", "TEST.NETWORK-GROUP_3"
     # "192.168.64.0/20", "TEST.NETWORK-GROUP_1"
 
-    nwog_dicts = {}
-    with open('workstation_subnets.csv') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            subnet_nwog = row['subnet_nwog']
-            # If we have not seen this key before, create a new dictionary for it
-            if subnet_nwog not in nwog_dicts.keys():
-                nwog_dicts[subnet_nwog] = {"name": subnet_nwog,
-                                            "overridable": True,
-                                            "type": "NetworkGroup",
-                                            "literals": []}
-
-            d = {"type": "Network", "value": row['subnet_cidr']}
-            nwog_dicts[subnet_nwog]["literals"].append(d)
-
     action = 'DELETE'  # or 'DELETE'
     with fmc.FMC(url=server_url, username=username, password=password) as lab_fmc:
         # Build the object names dictionary for the FMC
@@ -60,11 +44,13 @@ def main():
             # ['hosts', 'networks', 'ranges', 'networkgroups']
             lab_fmc.obj_tables[obj_type].build()
 
-        for nwog_name, nwog_data in nwog_dicts.items():
-            if action is 'CREATE':
-                logging.info("Creating object-group {}".format(nwog_name))
-                obj_nw_group = fmc.FPObject(lab_fmc, type='networkgroups', data=nwog_data)
-            elif action is 'DELETE':  # This helps in testing the script multiple times
+        importer = fmc.FPNetworkGroupImporter(lab_fmc)
+        if action is 'CREATE':
+            # Groups are created with bulk requests, CIDRs are validated and merged per group
+            importer.run('workstation_subnets.csv')
+        elif action is 'DELETE':  # This helps in testing the script multiple times
+            nwog_names = set(nwog_name for nwog_name, _ in importer.read('workstation_subnets.csv'))
+            for nwog_name in nwog_names:
                 if nwog_name in lab_fmc.obj_tables['networkgroups'].names.keys():
                     obj_nw_group = fmc.FPObject(lab_fmc, type='networkgroups', name=nwog_name)
                     logging.info("Deleting object-group {}".format(nwog_name))
@@ -6,9 +6,11 @@ data representation such as JSON or XML.
 from .rest import *
 from xml_handler import *
 from json_handler import *
+from workers import iter_parallel, imap_parallel, map_parallel
 
 __author__ = "Chetankumar Phulpagare"
 __copyright__ = ""
 __credits__ = ["Chetankumar Phulpagare"]
 __email__ = "chetanph"
-__all__ = ['RestClient', 'AppClient', 'RestClientError', 'RestDataHandler', 'RestXMLHandler', 'RestJSONHandler']
+__all__ = ['RestClient', 'AppClient', 'RestClientError', 'RestDataHandler', 'RestXMLHandler', 'RestJSONHandler',
+           'iter_parallel', 'imap_parallel', 'map_parallel']
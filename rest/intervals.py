@@ -0,0 +1,119 @@
+"""
+Integer interval helpers shared by rule indexes of different applications, e.g. `fmc.rulematch` and `csm.flows`.
+
+Addresses and ports are turned into points of integer domains, so that address ranges, networks and port ranges are
+`(lo, hi)` intervals, both ends included, and lookups are `bisect` over sorted interval boundaries.
+
+This module is not imported by `rest` itself, as it needs `netaddr`.
+"""
+from bisect import bisect_right
+from netaddr import IPAddress
+
+# IPv4 and IPv6 addresses share one integer domain, IPv6 addresses are placed above the IPv4 address space
+IPV6_OFFSET = 1 << 32
+IP_ANY = (0, IPV6_OFFSET + (1 << 128) - 1)
+# Ports are encoded as 'protocol * 65536 + port', ICMP types take place of the port
+PORT_ANY = (0, (256 << 16) - 1)
+PROTOCOLS = {
+    'ICMP': 1, 'TCP': 6, 'UDP': 17, 'GRE': 47, 'ESP': 50, 'AH': 51,
+    'ICMPV6': 58, 'IPV6-ICMP': 58, 'SCTP': 132}
+
+
+def merge_intervals(intervals):
+    """
+    Sort and merge overlapping or adjacent intervals.
+
+    # Parameters
+    intervals: Iterable of `(lo, hi)` tuples, both ends included
+
+    :return: List of disjoint `(lo, hi)` tuples in ascending order
+    """
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def ip_to_int(address):
+    """
+    Convert IPv4 or IPv6 address string to a point of the shared address domain.
+    """
+    ip = IPAddress(address)
+    if ip.version == 6:
+        return IPV6_OFFSET + int(ip)
+    return int(ip)
+
+
+def protocol_number(protocol):
+    """
+    Convert protocol name, e.g. 'TCP', or number string to protocol number.
+    """
+    if isinstance(protocol, (int, long)):
+        return protocol
+    protocol = str(protocol).strip().upper()
+    if protocol.isdigit():
+        return int(protocol)
+    return PROTOCOLS[protocol]
+
+
+def contains(outer, inner):
+    """
+    Check if every interval of merged interval list `inner` lies within some interval of merged list `outer`.
+    """
+    i = 0
+    for lo, hi in inner:
+        while i < len(outer) and outer[i][1] < lo:
+            i += 1
+        if i == len(outer) or outer[i][0] > lo or outer[i][1] < hi:
+            return False
+    return True
+
+
+class IntervalIndex(object):
+    """
+    Index of disjoint integer intervals per rule for one dimension of the match space, e.g. source address. Interval
+    ends are turned into sorted boundaries and each elementary segment between two boundaries holds a bitmask of the
+    rules covering it. Point lookup is a single `bisect`.
+
+    Rules are identified by their bit number. Intervals of one rule must be merged using `merge_intervals`.
+    """
+    def __init__(self):
+        self._toggles = {}
+        self.bounds = []
+        self.masks = []
+
+    def add(self, bit, intervals):
+        flag = 1 << bit
+        for lo, hi in intervals:
+            self._toggles[lo] = self._toggles.get(lo, 0) ^ flag
+            self._toggles[hi + 1] = self._toggles.get(hi + 1, 0) ^ flag
+
+    def build(self):
+        mask = 0
+        for bound in sorted(self._toggles):
+            mask ^= self._toggles[bound]
+            self.bounds.append(bound)
+            self.masks.append(mask)
+        self._toggles = {}
+
+    def lookup(self, point):
+        """
+        :return: Bitmask of rules with an interval containing `point`
+        """
+        i = bisect_right(self.bounds, point) - 1
+        if i < 0:
+            return 0
+        return self.masks[i]
+
+    def lookup_range(self, lo, hi):
+        """
+        :return: Bitmask of rules with an interval overlapping `(lo, hi)`
+        """
+        mask = 0
+        for i in xrange(max(0, bisect_right(self.bounds, lo) - 1), bisect_right(self.bounds, hi)):
+            mask |= self.masks[i]
+        return mask
@@ -1,4 +1,5 @@
 import requests
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -75,6 +76,15 @@ class AppClient(object):
         self.hdrs_req[self.AUTH_HDR_FIELD] = self.token
         super(AppClient, self)._req(*args, **kwargs)
 
+    def reauthenticate(self, token):
+        """
+        Called when server rejects `token` with HTTP error 401. Application clients may override it to refresh the
+        token or login again.
+
+        return: `True` if the request must be repeated with the new token
+        """
+        return False
+
 
 class RestClient(AppClient, RestDataHandler):
     """
@@ -99,9 +109,11 @@ class RestClient(AppClient, RestDataHandler):
 
         self.url = url     # Server URL
         self.token = None  # Authentication token
+        self.login_headers = {}  # Headers of the authentication response
         self.username = username
         self.password = password
         self.session = requests.Session()
+        self._auth_lock = threading.RLock()  # Serializes token changes between threads
         super(RestClient, self).__init__()
         if self.username and self.password:
             self.login()
@@ -127,6 +139,7 @@ class RestClient(AppClient, RestDataHandler):
                 logger.fatal("Error code {} in the HTTP request".format(resp.status_code))
                 exit(1)
             self.token = resp.headers.get(self.AUTH_REQ_HDR_FIELD, default=None)
+            self.login_headers = resp.headers
             logging.info("{}: Login Successful!".format(self.url))
             logging.debug("REST API Server Auth token: {}".format(self.token))
         except requests.exceptions.HTTPError as err:
@@ -143,7 +156,7 @@ class RestClient(AppClient, RestDataHandler):
         super(RestClient, self).logout()
         if self.LOGOUT_URL:
             url = self.url + self.LOGOUT_URL
-            self._req(url, method=self.logout_method, data=self.logout_data)
+            self._req(url, method=self.logout_method, data=self.logout_data, reauth=False)
         logging.info("{}: Logout Successful!".format(self.url))
 
     def _req(self, url, method='GET', data=None, **kwargs):
@@ -155,11 +168,13 @@ class RestClient(AppClient, RestDataHandler):
         path: Path to append to server URL
         method: REST API method, can be any of methods supported by application.
         data: Request data
+        reauth: Repeat request once if token is rejected and `reauthenticate` provides a new one
 
         return: Response from REST server
         """
         if url is None:
             raise RestClientError("REST URL needs to be specified")
+        reauth = kwargs.pop('reauth', True)
 
         super(RestClient, self)._req(method=method, data=data, **kwargs)
         req_data = self.prepare_data(data=data, **kwargs)
@@ -176,6 +191,11 @@ class RestClient(AppClient, RestDataHandler):
             req = requests.Request(method, url, data=req_data, headers=self.hdrs_req, params=kwargs.get('params'))
             prep_req = self.session.prepare_request(req)
             r = self.session.send(prep_req, verify=False)
+            if r.status_code == 401 and reauth:
+                # Token expired or revoked, e.g. during long running jobs
+                if self.reauthenticate(prep_req.headers.get(self.AUTH_HDR_FIELD)):
+                    logger.info("Repeating {} for {} with new token".format(method, url))
+                    return self._req(url, method=method, data=data, reauth=False, **kwargs)
             if r.status_code not in [200, 201, 202, 204]:
                 # 200-OK, 201-Created, 202-Accepted, 204-No Content
                 r.raise_for_status()
@@ -0,0 +1,110 @@
+import sys
+import logging
+import threading
+from Queue import Queue, Empty, Full
+
+logger = logging.getLogger(__name__)
+
+_RESULT = 0
+_ERROR = 1
+_DONE = 2
+
+
+def iter_parallel(func, items, workers=4, backlog=1000):
+    """
+    Generator function that runs `func(item)` for every item in `items` in a pool of worker threads. `func` must return
+    an iterable; everything it yields is passed on to the caller as soon as it is produced. Results of one item keep
+    their order, results of different items may be interleaved.
+
+    Worker threads block once `backlog` results are waiting for the caller, so a slow consumer throttles producers
+    instead of buffering everything in memory. If `func` raises, remaining work is cancelled and the exception is
+    re-raised in the caller.
+
+    # Parameters
+    func: Function called with a single item, returning an iterable
+    items: Iterable of items to hand over to `func`
+    workers: Maximum number of worker threads
+    backlog: Maximum number of results waiting for the caller
+    """
+    in_q = Queue()
+    for item in items:
+        in_q.put(item)
+    num_workers = max(1, min(workers, in_q.qsize()))
+    out_q = Queue(maxsize=backlog)
+    stop = threading.Event()
+
+    def _put(entry):
+        # Keep checking 'stop' so that workers exit when the caller goes away
+        while not stop.is_set():
+            try:
+                out_q.put(entry, timeout=0.5)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _worker():
+        while not stop.is_set():
+            try:
+                item = in_q.get_nowait()
+            except Empty:
+                break
+            try:
+                for result in func(item):
+                    if not _put((_RESULT, result)):
+                        return
+            except Exception:
+                _put((_ERROR, sys.exc_info()))
+                return
+        _put((_DONE, None))
+
+    threads = []
+    for _ in range(num_workers):
+        thread = threading.Thread(target=_worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    try:
+        done = 0
+        while done < num_workers:
+            kind, value = out_q.get()
+            if kind == _RESULT:
+                yield value
+            elif kind == _DONE:
+                done += 1
+            else:
+                raise value[0], value[1], value[2]
+    finally:
+        stop.set()
+
+
+def imap_parallel(func, items, workers=4, backlog=1000):
+    """
+    Generator function that runs `func(item)` for every item in `items` in a pool of worker threads and yields the
+    return values in the order of `items`. Results that complete early are held back until all preceding ones have
+    been yielded.
+
+    # Parameters
+    func: Function called with a single item
+    items: Iterable of items to hand over to `func`
+    workers: Maximum number of worker threads
+    backlog: Maximum number of results waiting for the caller
+    """
+    def _indexed(indexed_item):
+        yield indexed_item[0], func(indexed_item[1])
+
+    pending = {}
+    next_index = 0
+    for index, result in iter_parallel(_indexed, enumerate(items), workers=workers, backlog=backlog):
+        pending[index] = result
+        while next_index in pending:
+            yield pending.pop(next_index)
+            next_index += 1
+
+
+def map_parallel(func, items, workers=4):
+    """
+    Same as `imap_parallel` but returns a `list` of all results in the order of `items`.
+    """
+    return list(imap_parallel(func, items, workers=workers))
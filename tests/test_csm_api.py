@@ -0,0 +1,32 @@
+import unittest
+from csm.api import _child_first_levels
+
+
+class Refs(object):
+    def __init__(self, gids):
+        self.gid = gids
+
+
+class PolicyObject(object):
+    def __init__(self, *child_gids):
+        self.refGIDs = Refs(list(child_gids)) if child_gids else None
+
+
+class ChildFirstLevelsTest(unittest.TestCase):
+    def test_levels(self):
+        obj_table = {'a': PolicyObject(), 'b': PolicyObject('a', 'x'), 'c': PolicyObject('a', 'b')}
+        levels, cyclic, blocked, dangling = _child_first_levels(obj_table)
+        self.assertEqual(levels, [['a'], ['b'], ['c']])
+        self.assertEqual((cyclic, blocked, dangling), (set(), set(), {'x'}))
+
+    def test_group_containing_cycle(self):
+        obj_table = {'a': PolicyObject('b'), 'b': PolicyObject('a'), 'c': PolicyObject('a'), 'd': PolicyObject()}
+        levels, cyclic, blocked, dangling = _child_first_levels(obj_table)
+        self.assertEqual(levels, [['d']])
+        self.assertEqual(cyclic, {'a', 'b'})
+        self.assertEqual(blocked, {'c'})
+        self.assertEqual(dangling, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
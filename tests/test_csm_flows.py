@@ -0,0 +1,59 @@
+import unittest
+from csm.flows import CSMObjectResolver, port_interval
+
+
+class ProtocolPort(object):
+    def __init__(self, port=None, portRefGID=None):
+        self.port = port
+        self.portRefGID = portRefGID
+
+
+class ServiceParameters(object):
+    def __init__(self, protocol, destinationPort=None, sourcePort=None, icmpMessage=None):
+        self.protocol = protocol
+        self.destinationPort = destinationPort
+        self.sourcePort = sourcePort
+        self.icmpMessage = icmpMessage
+
+
+class PortIntervalTest(unittest.TestCase):
+    def test_operators(self):
+        self.assertEqual(port_interval('443'), (443, 443))
+        self.assertEqual(port_interval('1024-65535'), (1024, 65535))
+        self.assertEqual(port_interval('eq 443'), (443, 443))
+        self.assertEqual(port_interval('lt 1024'), (0, 1023))
+        self.assertEqual(port_interval('gt 1023'), (1024, 65535))
+        self.assertEqual(port_interval('range 1 1023'), (1, 1023))
+
+    def test_not_understood(self):
+        self.assertIsNone(port_interval('https'))
+        self.assertIsNone(port_interval('1 2 3'))
+
+    def test_empty_range(self):
+        self.assertIsNone(port_interval('lt 0'))
+        self.assertIsNone(port_interval('gt 65535'))
+        self.assertIsNone(port_interval('range 10 1'))
+
+
+class ServiceParametersTest(unittest.TestCase):
+    def setUp(self):
+        self.resolver = CSMObjectResolver({'network': {}, 'service': {}})
+
+    def test_ports(self):
+        dports, sports = self.resolver.service_parameters(
+            ServiceParameters('tcp', ProtocolPort('443'), ProtocolPort('gt 1023')))
+        self.assertEqual(dports, [((6 << 16) + 443, (6 << 16) + 443)])
+        self.assertEqual(sports, [((6 << 16) + 1024, (6 << 16) + 0xffff)])
+
+    def test_icmp_message_is_destination_only(self):
+        dports, sports = self.resolver.service_parameters(ServiceParameters('icmp', icmpMessage='8'))
+        self.assertEqual(dports, [((1 << 16) + 8, (1 << 16) + 8)])
+        self.assertEqual(sports, [(1 << 16, (1 << 16) + 0xffff)])
+
+    def test_port_reference(self):
+        self.assertIsNone(self.resolver.service_parameters(
+            ServiceParameters('tcp', ProtocolPort(portRefGID='00000000-0000-0000-0000-000000000001'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
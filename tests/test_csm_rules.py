@@ -0,0 +1,44 @@
+import io
+import json
+import unittest
+from csm.bindings import csmxsd
+from csm.lxml_decoder import CSMRecordDecoder
+from csm.pyxb_handler import RestPyxbHandler
+from csm.rules import CSMRuleTable
+
+POLICY_XML = u"""<?xml version="1.0" encoding="UTF-8"?>
+<ns1:policyConfigDeviceResponse xmlns:ns1="csm">
+<protVersion>1.0</protVersion><reqId>1</reqId>
+<policy><deviceAccessRuleUnifiedFirewallPolicy>
+<gid>00000000-0000-0000-0002-000000000001</gid><orderId>1</orderId><policyName>P</policyName>
+<sectionName>mandatory</sectionName><permit>true</permit>
+<sources><ipData>10.1.0.0/16</ipData></sources>
+<destinations><ipData>172.16.0.5</ipData></destinations>
+<services><serviceParameters><protocol>tcp</protocol><destinationPort><port>443</port></destinationPort>
+</serviceParameters></services>
+</deviceAccessRuleUnifiedFirewallPolicy></policy>
+</ns1:policyConfigDeviceResponse>"""
+
+
+class CSMRuleTableTest(unittest.TestCase):
+    def setUp(self):
+        decoder = CSMRecordDecoder(csmxsd, RestPyxbHandler.FAST_RESPONSE_TYPES)
+        self.rules = CSMRuleTable()
+        self.rules.add_policy(decoder.decode(decoder.parse(POLICY_XML)))
+
+    def test_service_port_csv(self):
+        csvfile = io.BytesIO()
+        self.assertEqual(self.rules.to_csv(csvfile), 1)
+        row = csvfile.getvalue().splitlines()[1]
+        self.assertTrue(row.endswith('10.1.0.0/16,172.16.0.5,tcp/443'), row)
+
+    def test_service_port_ndjson(self):
+        ndjson_file = io.BytesIO()
+        self.assertEqual(self.rules.to_ndjson(ndjson_file), 1)
+        rule = json.loads(ndjson_file.getvalue())
+        self.assertEqual(rule['services'], ['tcp/443'])
+        self.assertEqual(rule['permit'], 'true')
+
+
+if __name__ == '__main__':
+    unittest.main()